@@ -1,31 +1,42 @@
+import time
+_SCRIPT_START = time.perf_counter()  # 用於量測頁面執行時間
+
 import streamlit as st
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 import pandas as pd
 import io
-import streamlit.components.v1 as components
+import logging
+import os
+import uuid
+from barcode_component import barcode_scanner, decode_stats
+from drive_client import get_drive_service, get_drive_watcher, timings, warm_up_in_background
+from carton_decode import decode_images
+from depot_schema import SchemaError, normalize_workbook
+from drive_watcher import download_file_bytes, is_excel_file
+from forecast import forecast_site, load_history
+from scan_counts import COUNT_COLUMNS, PICK, RECEIVE, STATUS_COLUMNS, get_shared_counter, reconcile
+from wave_picking import get_wave_board
 
 # 設置頁面
 st.set_page_config(page_title="藥品庫存管理系統", layout="wide")
 
-# 創建 Google Drive API 客戶端
-@st.cache_resource
-def create_drive_client():
-    credentials = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=['https://www.googleapis.com/auth/drive.readonly']
-    )
-    return build('drive', 'v3', credentials=credentials)
+DRIVE_FOLDER_ID = '1LdDnfuu3N8v9PkePOhuJd0Ffv_FBQsMA'  # Google Drive 文件夾 ID
+
+FIRST_PAINT_TARGET = 1.0  # 首次渲染目標時間（秒）
+TABLE_REFRESH_SECONDS = 5  # 清單表格的定時刷新間隔（秒）
 
-drive_service = create_drive_client()
+logger = logging.getLogger(__name__)
 
 def list_files_in_folder(folder_id):
     try:
-        results = drive_service.files().list(
-            q=f"'{folder_id}' in parents",  # 移除 MIME 類型檢查
-            fields="files(id, name, mimeType)").execute()
-        files = results.get('files', [])
+        watcher = get_drive_watcher(DRIVE_FOLDER_ID)
+        if watcher.last_error is not None:
+            st.warning(f"背景同步 Google Drive 失敗，將直接讀取: {watcher.last_error}")
+        files = watcher.cache.listing(folder_id)
+        if files is None:
+            results = get_drive_service().files().list(
+                q=f"'{folder_id}' in parents",  # 移除 MIME 類型檢查
+                fields="files(id, name, mimeType, modifiedTime)").execute()
+            files = results.get('files', [])
         st.write(f"找到 {len(files)} 個文件")
         for file in files:
             st.write(f"文件名: {file['name']}, ID: {file['id']}, 類型: {file['mimeType']}")
@@ -34,52 +45,49 @@ def list_files_in_folder(folder_id):
         st.error(f"獲取文件列表時發生錯誤: {str(e)}")
         return []
 
-def read_excel_from_drive(file_id):
-    request = drive_service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while done is False:
-        status, done = downloader.next_chunk()
-    fh.seek(0)
-    return pd.read_excel(fh)
+def read_excel_from_drive(file_id, modified_time=None):
+    # 優先使用背景預取的結果
+    df = get_drive_watcher(DRIVE_FOLDER_ID).cache.get(file_id, modified_time)
+    if df is not None:
+        return df
+    return pd.read_excel(io.BytesIO(download_file_bytes(get_drive_service(), file_id)))
 
 def read_from_drive():
     st.subheader("從 Google Drive 讀取")
-    folder_id = '1LdDnfuu3N8v9PkePOhuJd0Ffv_FBQsMA'  # Google Drive 文件夾 ID
-    files = list_files_in_folder(folder_id)
+    files = list_files_in_folder(DRIVE_FOLDER_ID)
     
     if not files:
         st.warning("未找到 Excel 文件")
         if st.button("重新整理"):
-            st.experimental_rerun()
+            st.rerun()
         return None
     
     selected_file = st.selectbox("選擇 Excel 文件", [file['name'] for file in files])
-    file_id = next(file['id'] for file in files if file['name'] == selected_file)
+    file = next(file for file in files if file['name'] == selected_file)
     
     try:
-        df = read_excel_from_drive(file_id)
-        # 讀取 Excel 文件後，檢查並添加 '檢貨狀態' 列
-        if '檢貨狀態' not in df.columns:
-            df['檢貨狀態'] = '未檢貨'
-            st.info("已添加 '檢貨狀態' 列到數據中")
-
-        # 確保條碼列被正確讀取
-        if '條碼' in df.columns:
-            df['條碼'] = df['條碼'].astype(str).str.strip()
-        else:
-            st.error("數據中缺少 '條碼' 列")
+        # 按欄位定義統一欄位名稱、條碼與數量格式
+        df, report = normalize_workbook(read_excel_from_drive(file['id'], file.get('modifiedTime')))
+        if not report.empty:
+            st.warning(f"{selected_file} 中有 {len(report)} 項數據問題：")
+            st.dataframe(report)
+
+        # 多台裝置讀入同一版本的工作簿時共用檢貨／收貨計數與分波狀態
+        st.session_state['inventory_key'] = (file['id'], file.get('modifiedTime'))
+        get_scan_counter(df).apply_to(df)
 
         st.session_state['inventory_df'] = df
         st.success(f"已成功讀取 {selected_file}")
         st.write(df)
+    except SchemaError as e:
+        st.error(str(e))
+        st.dataframe(e.report)
     except Exception as e:
         st.error(f"讀取文件時發生錯誤: {str(e)}")
 
 def test_drive_access():
     try:
-        results = drive_service.files().list(pageSize=10, fields="files(id, name, mimeType)").execute()
+        results = get_drive_service().files().list(pageSize=10, fields="files(id, name, mimeType)").execute()
         items = results.get('files', [])
         st.write('服務帳號可以訪問 Google Drive。找到的文件：')
         for item in items:
@@ -87,16 +95,38 @@ def test_drive_access():
     except Exception as e:
         st.error(f"訪問 Google Drive 時發生錯誤: {str(e)}")
 
+def inventory_key():
+    # 不是從 Drive 讀入的工作簿無法跨裝置辨認，改用會話專屬的鍵，避免不同工作簿共用計數
+    if 'inventory_key' not in st.session_state:
+        st.session_state['inventory_key'] = ('local', uuid.uuid4().hex)
+    return st.session_state['inventory_key']
+
+def get_scan_counter(df):
+    # 計數按工作簿在所有會話之間共享，檢貨與收貨可以在不同裝置上進行
+    return get_shared_counter(inventory_key(), df)
+
+def get_board(df):
+    # 分波狀態在同一份工作簿的所有會話之間共享
+    return get_wave_board(inventory_key(), df)
+
+def record_scan(df, label, kind):
+    """為指定行加上一個最小包裝，並同步該行的數量與狀態列"""
+    counter = get_scan_counter(df)
+    position = df.index.get_loc(label)
+    count = counter.scan(position, kind)
+    status = counter.status(position, kind)
+    df.at[label, COUNT_COLUMNS[kind]] = count
+    df.at[label, STATUS_COLUMNS[kind]] = status
+    if kind == PICK and status == '已檢貨':
+        get_board(df).mark_done(position)
+    return count, int(counter.target[position]), status
+
 def format_ean13(barcode):
     """將條碼格式化為 EAN-13 格式"""
     barcode = str(barcode).zfill(13)  # 補零至 13 位
     return f"{barcode[:1]} {barcode[1:7]} {barcode[7:]}"  # 格式化顯示
 
-def check_and_mark_item(df, barcode):
-    if '條碼' not in df.columns:
-        st.error("數據框中缺少 '條碼' 列")
-        return df
-    
+def check_and_mark_item(df, barcode, count=True):
     # 首先嘗試完全匹配
     item = df[df['條碼'].astype(str).str.zfill(13) == str(barcode).zfill(13)]
     
@@ -111,6 +141,7 @@ def check_and_mark_item(df, barcode):
                 formatted_barcode = format_ean13(row['條碼'])
                 if st.button(f"{row['藥品名稱']} - 條碼: {formatted_barcode}", key=f"select_{index}"):
                     selected_item = row
+                    count = True  # 手動選擇本身就是一次掃描
                     break
             else:
                 st.info("請選擇一個商品")
@@ -125,197 +156,97 @@ def check_and_mark_item(df, barcode):
             if col in selected_item.index:
                 st.write(f"{col}：{selected_item[col]}")
         
-        if '檢貨狀態' in selected_item.index:
-            if selected_item['檢貨狀態'] != '已檢貨':
-                df.loc[df['條碼'] == selected_item['條碼'], '檢貨狀態'] = '已檢貨'
-                st.success("商品已自動標記為已檢貨")
-            else:
-                st.info("此商品已經檢貨")
+        if not count:
+            return df
+        if selected_item.get('檢貨狀態') == '已檢貨':
+            st.info("此商品已經檢貨完成，本次掃描將計為多檢")
+        picked, target, status = record_scan(df, selected_item.name, PICK)
+        if status == '已檢貨':
+            st.success(f"商品已檢貨完成：{picked}/{target}")
         else:
-            st.warning("無法更新檢貨狀態，因為數據框中缺少 '檢貨狀態' 列")
+            st.info(f"已檢數量：{picked}/{target}，請繼續掃描")
     else:
         st.error(f"未找到條碼為 {format_ean13(barcode)} 的商品，請檢查條碼是否正確")
     
     return df
 
-def check_inventory():
-    st.subheader("檢貨")
-    
-    if 'inventory_df' not in st.session_state:
-        st.warning("請先從 Google Drive 讀取庫存文件")
-        if st.button("前往讀取數據"):
-            st.session_state.function_selection = "從 Google Drive 讀取"
-            st.rerun()
-        return
-
+@st.fragment(run_every=TABLE_REFRESH_SECONDS)
+def pick_table_fragment():
+    # 表格只按固定間隔刷新，掃描時不重繪整個清單
     df = st.session_state['inventory_df']
-    
-    # 顯示當前庫存狀態
-    display_columns = ['藥庫位置', '藥品名稱', '盤撥量', '藥庫庫存', '檢貨狀態']
+    # 寫入共享的計數，其他裝置的掃描也會顯示
+    get_scan_counter(df).apply_to(df)
+    display_columns = ['藥庫位置', '藥品名稱', '盤撥量', '檢貨數量', '藥庫庫存', '檢貨狀態']
     df_display = df[display_columns]
-    st.write("當前庫存狀態：")
-    st.dataframe(df_display.style.applymap(
-        lambda x: 'background-color: #90EE90' if x == '已檢貨' else 'background-color: #FFB6C1',
+
+    # 已分波時只顯示分配給本裝置的行；有人提早完成時自動重新分配
+    board = get_board(df)
+    picker = st.session_state.get('wave_picker', 0)
+    if board.pickers and picker:
+        if board.rebalance():
+            st.toast("有檢貨員已完成，已重新分配剩餘的區域")
+        df_display = df_display.iloc[board.rows_for(picker - 1)]
+        st.write(f"檢貨員 {picker} 的清單（{len(df_display)} 行）：")
+    else:
+        st.write("當前庫存狀態：")
+    st.dataframe(df_display.style.map(
+        lambda x: 'background-color: #90EE90' if x == '已檢貨' else
+                  'background-color: #FFE4B5' if x == '部分檢貨' else 'background-color: #FFB6C1',
         subset=['檢貨狀態']
     ))
 
-    # 添加條碼掃描功能
-    barcode_scanner_html = """
-    <div id="scanner-container"></div>
-    <button id="start-scanner">開始/停止掃描</button>
-    <div id="scanner-status"></div>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/quagga/0.12.1/quagga.min.js"></script>
-    <script>
-        var scannerIsRunning = false;
-
-        function startScanner() {
-            Quagga.init({
-                inputStream: {
-                    name: "Live",
-                    type: "LiveStream",
-                    target: document.querySelector('#scanner-container'),
-                    constraints: {
-                        width: {min: 640},
-                        height: {min: 480},
-                        aspectRatio: {min: 1, max: 2},
-                        facingMode: "environment"
-                    },
-                },
-                locator: {
-                    patchSize: "medium",
-                    halfSample: true
-                },
-                numOfWorkers: 2,
-                decoder: {
-                    readers: [
-                        {
-                            format: "ean_reader",
-                            config: {
-                                supplements: [
-                                    'ean_5_reader', 'ean_2_reader'
-                                ]
-                            }
-                        },
-                        {
-                            format: "ean_8_reader",
-                            config: {
-                                supplements: [
-                                    'ean_5_reader', 'ean_2_reader'
-                                ]
-                            }
-                        },
-                        "code_128_reader",
-                        "code_39_reader",
-                        "code_39_vin_reader",
-                        "codabar_reader",
-                        "upc_reader",
-                        "upc_e_reader",
-                        "i2of5_reader"
-                    ]
-                },
-                locate: true,
-                frequency: 10
-            }, function(err) {
-                if (err) {
-                    console.log(err);
-                    document.querySelector('#scanner-status').textContent = "無法啟動掃描器：" + err;
-                    return;
-                }
-                Quagga.start();
-                scannerIsRunning = true;
-                document.querySelector('#scanner-status').textContent = "掃描器已啟動";
-            });
-
-            Quagga.onDetected(function(result) {
-                var code = result.codeResult.code;
-                document.querySelector('#scanner-status').textContent = "已掃描到條碼：" + code;
-                
-                // 檢查條碼長度是否正確
-                if (code.length === 13 || code.length === 8) {
-                    // 更新 Streamlit 的輸入欄位並觸發檢查
-                    var streamlitInput = parent.document.querySelector('.stTextInput input');
-                    if (streamlitInput) {
-                        streamlitInput.value = code;
-                        streamlitInput.dispatchEvent(new Event('input', { bubbles: true }));
-                        
-                        // 觸發表單提交
-                        var submitButton = parent.document.querySelector('button[kind="primaryFormSubmit"]');
-                        if (submitButton) {
-                            submitButton.click();
-                        }
-                    }
-                } else {
-                    document.querySelector('#scanner-status').textContent = "掃描到無效條碼，請重試";
-                }
-            });
-        }
-
-        document.querySelector('#start-scanner').addEventListener('click', function() {
-            if (scannerIsRunning) {
-                Quagga.stop();
-                scannerIsRunning = false;
-                this.textContent = "開始掃描";
-                document.querySelector('#scanner-status').textContent = "掃描器已停止";
-            } else {
-                startScanner();
-                this.textContent = "停止掃描";
-            }
-        });
-    </script>
-    """
-    
-    st.markdown("""
-    <style>
-    #scanner-container {
-        position: relative;
-        width: 100%;
-        max-width: 320px;
-        height: 240px;
-        overflow: hidden;
-        margin: auto;
-    }
-    #scanner-container video {
-        width: 100%;
-        height: 100%;
-        object-fit: cover;
-    }
-    #start-scanner {
-        display: block;
-        margin: 10px auto;
-        padding: 10px 20px;
-        font-size: 16px;
-    }
-    #scanner-status {
-        text-align: center;
-        margin-top: 10px;
-        font-weight: bold;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    components.html(barcode_scanner_html, height=400)
+@st.fragment
+def pick_scan_fragment():
+    # 每次掃描只重新執行此片段：結果與進度即時更新，掃描器 iframe 保持運行
+    df = st.session_state['inventory_df']
 
     # 使用 form 來處理條碼輸入
-    with st.form(key='barcode_form'):
+    with st.form(key='barcode_form', clear_on_submit=True):
         barcode = st.text_input("輸入商品條碼或掃描條碼", key="barcode_input")
         submit_button = st.form_submit_button("檢查商品")
 
-    if submit_button or barcode:
-        df = check_and_mark_item(df, barcode)
-        if st.button("確認更新"):
-            st.session_state['inventory_df'] = df  # 更新 session state 中的數據
-            st.success("數據已更新")
-            st.rerun()  # 強制重新運行應用以刷新顯示
+    # 保留最後一次掃描的條碼，以便多筆匹配時選擇商品
+    if submit_button and barcode:
+        st.session_state['last_pick_barcode'] = barcode
+    barcode = st.session_state.get('last_pick_barcode')
+    if barcode:
+        start = time.perf_counter()
+        # 只在提交時計數，避免其他操作觸發的重新執行重複累加
+        check_and_mark_item(df, barcode, count=submit_button)
+        if submit_button:
+            st.caption(f"處理時間：{(time.perf_counter() - start) * 1000:.0f} ms")
 
     # 顯示檢貨進度
-    total_items = len(df)
-    checked_items = len(df[df['檢貨狀態'] == '已檢貨'])
-    progress = checked_items / total_items
+    checked_items, total_items = get_scan_counter(df).progress(PICK)
+    progress = checked_items / total_items if total_items else 1.0
     st.progress(progress)
     st.write(f"檢貨進度：{checked_items}/{total_items} ({progress:.2%})")
 
-def receive_inventory():
-    st.subheader("收貨")
+@st.fragment
+def scanner_fragment():
+    # 解碼在瀏覽器的 Web Worker 中進行，條碼直接提交到掃描片段的表單
+    barcode_scanner(key='pick_scanner')
+    stats = decode_stats()
+    if stats['frames']:
+        st.caption(f"解碼時間：p50 {stats['p50']:.1f} ms，p95 {stats['p95']:.1f} ms（{stats['frames']} 幀）")
+
+def wave_panel():
+    """按 藥庫位置 / 藥庫層數 把待檢的行平均分給多位檢貨員"""
+    df = st.session_state['inventory_df']
+    board = get_board(df)
+    with st.expander("分波檢貨", expanded=bool(board.pickers)):
+        pickers = st.number_input("檢貨人數", min_value=1, max_value=20,
+                                  value=max(board.pickers, 1), step=1)
+        if st.button("分配區域"):
+            counter = get_scan_counter(df)
+            board.plan(int(pickers), done=counter.counts[PICK] >= counter.target)
+        if board.pickers:
+            st.selectbox("本裝置的檢貨員", range(board.pickers + 1), key='wave_picker',
+                         format_func=lambda picker: f"檢貨員 {picker}" if picker else "全部")
+            st.dataframe(board.workload(), hide_index=True)
+
+def check_inventory():
+    st.subheader("檢貨")
     
     if 'inventory_df' not in st.session_state:
         st.warning("請先從 Google Drive 讀取庫存文件")
@@ -324,60 +255,174 @@ def receive_inventory():
             st.rerun()
         return
 
+    wave_panel()
+    pick_table_fragment()
+
+    # 添加條碼掃描功能（位於獨立片段中，掃描與回報解碼時間時都不會重新載入攝像頭）
+    scanner_fragment()
+
+    pick_scan_fragment()
+
+RECEIVE_DISPLAY_COLUMNS = ['藥品名稱', '盤撥量', '收貨數量', '收貨狀態']
+
+@st.fragment(run_every=TABLE_REFRESH_SECONDS)
+def receive_table_fragment():
+    # 表格與對帳只按固定間隔刷新
     df = st.session_state['inventory_df']
-    
-    # 只選擇需要的列
-    display_columns = ['藥品名稱', '盤撥量', '收貨狀態']
-    df_display = df[display_columns]
+    # 寫入共享的計數，其他裝置的掃描也會顯示
+    get_scan_counter(df).apply_to(df)
+    df_display = df[RECEIVE_DISPLAY_COLUMNS]
 
     # 顯示當前收貨狀態
     st.write("當前收貨狀態：")
-    st.dataframe(df_display.style.applymap(
-        lambda x: 'background-color: #90EE90' if x == '已收貨' else 'background-color: #FFB6C1',
+    st.dataframe(df_display.style.map(
+        lambda x: 'background-color: #90EE90' if x == '已收貨' else
+                  'background-color: #FFE4B5' if x == '部分收貨' else 'background-color: #FFB6C1',
         subset=['收貨狀態']
     ))
 
+    # 檢貨與收貨數量對帳
+    with st.expander("檢貨／收貨對帳"):
+        report = reconcile(df, get_scan_counter(df))
+        if report.empty:
+            st.success("所有品項的檢貨與收貨數量相符")
+        else:
+            st.dataframe(report)
+
+@st.fragment
+def receive_scan_fragment():
+    # 每次掃描只重新執行此片段
+    df = st.session_state['inventory_df']
+
     # 使用 form 來確保條碼輸入後可以立即處理
-    with st.form(key='barcode_form'):
+    with st.form(key='barcode_form', clear_on_submit=True):
         barcode = st.text_input("輸入商品條碼或掃描條碼", key="barcode_input")
         submit_button = st.form_submit_button("檢查商品")
 
-    if submit_button or barcode:
-        receive_item(df, barcode, display_columns)
+    if submit_button and barcode:
+        st.session_state['last_receive_barcode'] = barcode
+    barcode = st.session_state.get('last_receive_barcode')
+    if barcode:
+        start = time.perf_counter()
+        receive_item(df, barcode, RECEIVE_DISPLAY_COLUMNS, count=submit_button)
+        if submit_button:
+            st.caption(f"處理時間：{(time.perf_counter() - start) * 1000:.0f} ms")
 
     # 顯示收貨進度
-    total_items = len(df)
-    received_items = len(df[df['收貨狀態'] == '已收貨'])
-    progress = received_items / total_items
+    received_items, total_items = get_scan_counter(df).progress(RECEIVE)
+    progress = received_items / total_items if total_items else 1.0
     st.progress(progress)
     st.write(f"收貨進度：{received_items}/{total_items} ({progress:.2%})")
 
-def receive_item(df, barcode, display_columns):
-    if '條碼' not in df.columns:
-        st.error("數據框中缺少 '條碼' 列")
+@st.fragment
+def receive_photo_fragment():
+    # 拍照收貨：一次解碼整箱或整層貨架的條碼，批次計入收貨數量
+    df = st.session_state['inventory_df']
+
+    st.markdown("### 拍照收貨")
+    with st.form(key='photo_form', clear_on_submit=True):
+        photos = st.file_uploader("上傳整箱或貨架的照片", type=['jpg', 'jpeg', 'png'], accept_multiple_files=True)
+        submit_button = st.form_submit_button("辨識並收貨")
+    if not (submit_button and photos):
+        return
+
+    start = time.perf_counter()
+    try:
+        results = decode_images([photo.getvalue() for photo in photos])
+    except ImportError:
+        st.error("拍照收貨需要安裝 pyzbar 與 opencv-python-headless")
+        return
+    except Exception as e:
+        st.error(f"辨識照片時發生錯誤: {str(e)}")
         return
+
+    barcodes = [code for found in results for code, _, _ in found]
+    counter = get_scan_counter(df)
+    added, missing = counter.scan_many(barcodes, RECEIVE)
+    counter.apply_to(df)
+    st.session_state['inventory_df'] = df
+
+    st.success(f"從 {len(photos)} 張照片辨識到 {len(barcodes)} 個條碼，已計入 {len(added)} 項商品")
+    if added:
+        summary = df.iloc[list(added)][['條碼', '藥品名稱', '盤撥量', '收貨數量', '收貨狀態']].copy()
+        summary.insert(2, '本次件數', list(added.values()))
+        st.dataframe(summary)
+    if missing:
+        st.warning(f"以下條碼不在清單中：{', '.join(missing)}")
+    st.caption(f"處理時間：{(time.perf_counter() - start) * 1000:.0f} ms")
+
+def receive_inventory():
+    st.subheader("收貨")
     
-    item = df[df['條碼'] == barcode]
-    if not item.empty:
+    if 'inventory_df' not in st.session_state:
+        st.warning("請先從 Google Drive 讀取庫存文件")
+        if st.button("前往讀取數據"):
+            st.session_state.function_selection = "從 Google Drive 讀取"
+            st.rerun()
+        return
+
+    receive_table_fragment()
+    receive_scan_fragment()
+    receive_photo_fragment()
+
+def receive_item(df, barcode, display_columns, count=True):
+    positions = get_scan_counter(df).lookup(barcode)
+    if positions:
+        item = df.iloc[positions]
         st.success(f"找到商品：{item['藥品名稱'].values[0]}")
         for col in display_columns:
             if col in item.columns:
                 st.write(f"{col}：{item[col].values[0]}")
-        if item['收貨狀態'].values[0] != '已收貨':
-            if st.button("標記為已收貨"):
-                df.loc[df['條碼'] == barcode, '收貨狀態'] = '已收貨'
-                st.session_state['inventory_df'] = df
-                st.success("商品已標記為已收貨")
-                st.rerun()
+        if not count:
+            return
+        # 同一條碼有多行時，優先計入尚未收齊的行
+        pending = item[item['收貨狀態'] != '已收貨']
+        label = pending.index[0] if not pending.empty else item.index[0]
+        if pending.empty:
+            st.info("此商品已經收貨完成，本次掃描將計為溢收")
+        received, target, status = record_scan(df, label, RECEIVE)
+        st.session_state['inventory_df'] = df
+        if status == '已收貨':
+            st.success(f"商品已收貨完成：{received}/{target}")
         else:
-            st.info("此商品已經收貨")
+            st.warning(f"已收數量：{received}/{target}，尚缺 {target - received}")
     else:
         st.error("未找到該商品，請檢查條碼是否正確")
 
+def forecast_transfers():
+    st.subheader("撥補量預測")
+    days = st.slider("使用的歷史天數", min_value=28, max_value=180, value=90, step=7)
+
+    if st.button("開始預測"):
+        files = [file for file in list_files_in_folder(DRIVE_FOLDER_ID) if is_excel_file(file)]
+        try:
+            with st.spinner("正在讀取歷史工作簿並計算預測..."):
+                history = load_history(files, read_excel_from_drive, days)
+                if history.empty:
+                    st.warning("未找到可用的歷史工作簿")
+                    return
+                st.session_state['forecast_df'] = forecast_site(history)
+        except Exception as e:
+            st.error(f"預測時發生錯誤: {str(e)}")
+            return
+
+    if 'forecast_df' in st.session_state:
+        result = st.session_state['forecast_df']
+        display_columns = ['藥品代碼', '藥品名稱', '現有庫存', '安全存量', '預測用量', '盤撥量', '撥補盒箱數']
+        st.write("明日建議撥補量：")
+        st.dataframe(result[display_columns])
+        st.download_button("下載建議撥補量", result.to_csv(index=False).encode('utf-8-sig'),
+                           file_name="建議撥補量.csv", mime="text/csv")
+
 def main():
     st.title("藥品庫存管理系統")
 
-    function = st.sidebar.radio("選擇功能", ("從 Google Drive 讀取", "檢貨", "收貨", "備份到 Google Drive"), key="function_selection")
+    # 可選的預熱：在背景建立憑證並預取最新列表（DEPOT_WARMUP=0 可關閉）
+    if os.environ.get('DEPOT_WARMUP', '1') != '0':
+        warm_up_in_background(DRIVE_FOLDER_ID)
+
+    function = st.sidebar.radio("選擇功能", ("從 Google Drive 讀取", "檢貨", "收貨", "撥補量預測", "備份到 Google Drive"), key="function_selection")
+    mark_first_paint()
 
     if function == "從 Google Drive 讀取":
         read_from_drive()
@@ -385,42 +430,31 @@ def main():
         check_inventory()
     elif function == "收貨":
         receive_inventory()
+    elif function == "撥補量預測":
+        forecast_transfers()
     elif function == "備份到 Google Drive":
         backup_to_drive()
 
     if st.button("測試 Google Drive 訪問"):
         test_drive_access()
 
-st.markdown("""
-<style>
-#scanner-container {
-    position: relative;
-    width: 100%;
-    max-width: 640px;
-    height: 480px;
-    overflow: hidden;
-    margin: auto;
-}
-#scanner-container video {
-    width: 100%;
-    height: 100%;
-    object-fit: cover;
-}
-#start-scanner {
-    display: block;
-    margin: 10px auto;
-    padding: 10px 20px;
-    font-size: 16px;
-    -webkit-appearance: none;
-    border-radius: 0;
-}
-#scanner-status {
-    text-align: center;
-    margin-top: 10px;
-    font-weight: bold;
-}
-</style>
-""", unsafe_allow_html=True)
+    report_startup_time()
+
+def mark_first_paint():
+    # 標題與側邊欄畫出後即記錄首次渲染時間，不包含之後的 Drive 讀取與解析
+    if 'first_paint' not in st.session_state:
+        elapsed = time.perf_counter() - _SCRIPT_START
+        st.session_state['first_paint'] = elapsed
+        if elapsed > FIRST_PAINT_TARGET:
+            logger.warning("首次渲染耗時 %.2fs，超過目標 %.1fs", elapsed, FIRST_PAINT_TARGET)
+
+def report_startup_time():
+    # 記錄每次腳本執行的總耗時
+    elapsed = time.perf_counter() - _SCRIPT_START
+    caption = f"首次渲染：{st.session_state['first_paint']:.2f}s，本次執行：{elapsed:.2f}s"
+    if 'drive_client' in timings:
+        caption += f"，Drive 客戶端：{timings['drive_client']:.2f}s"
+    st.sidebar.caption(caption)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
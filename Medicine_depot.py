@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from barcode_component import barcode_scanner as scan_barcode
 
 def main():
     st.title("貨品庫存管理系統")
@@ -71,32 +72,4 @@ def delete_product():
 
 def barcode_scanner():
     st.subheader("條碼掃描")
-    scanner_html = """
-    <div id="scanner-container"></div>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/quagga/0.12.1/quagga.min.js"></script>
-    <script>
-        Quagga.init({
-            inputStream : {
-                name : "Live",
-                type : "LiveStream",
-                target: document.querySelector('#scanner-container')
-            },
-            decoder : {
-                readers : ["ean_reader", "ean_8_reader", "code_128_reader"]
-            }
-        }, function(err) {
-            if (err) {
-                console.log(err);
-                return
-            }
-            console.log("Initialization finished. Ready to start");
-            Quagga.start();
-        });
-        Quagga.onDetected(function(result) {
-            Quagga.stop();
-            Streamlit.setComponentValue(result.codeResult.code);
-        });
-    </script>
-    """
-    scanned_code = st.components.v1.html(scanner_html, height=300)
-    return scanned_code
+    return scan_barcode(key='scanner', submit_form=False)
@@ -0,0 +1,59 @@
+import logging
+import os
+import threading
+from collections import deque
+
+import numpy as np
+import streamlit as st
+import streamlit.components.v1 as components
+
+FPS = 8              # 每秒送去解碼的幀數，降低幀率讓手機保持流暢
+ROI = (0.8, 0.35)    # 解碼區域（畫面中央）佔寬、高的比例
+REPORT_SECONDS = 10  # 前端回報解碼時間的間隔（秒）
+MAX_SAMPLES = 5000   # 保留最近多少幀的解碼時間
+
+logger = logging.getLogger(__name__)
+
+# 前端文件隨應用一起部署，由 Streamlit 以元件路徑提供，不依賴外部 CDN
+_FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scanner_frontend')
+_component = components.declare_component('barcode_scanner', path=_FRONTEND)
+
+# 所有會話的解碼時間（毫秒），用於監控
+_lock = threading.Lock()
+_decode_ms = deque(maxlen=MAX_SAMPLES)
+
+
+def record_decode_times(samples):
+    with _lock:
+        _decode_ms.extend(samples)
+
+
+def decode_stats():
+    """返回最近各幀解碼時間的統計：幀數、p50、p95（毫秒）"""
+    with _lock:
+        values = np.array(_decode_ms, dtype=np.float64)
+    if not len(values):
+        return {'frames': 0, 'p50': None, 'p95': None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'frames': len(values), 'p50': float(p50), 'p95': float(p95)}
+
+
+def barcode_scanner(key='barcode_scanner', submit_form=True, autostart=False, fps=FPS, roi=ROI):
+    """顯示攝像頭掃描器
+
+    submit_form 為 True 時，掃到的條碼直接填入頁面上的表單並提交；
+    否則返回新掃到的條碼（沒有時為 None）。autostart 為 True 時載入後即開啟攝像頭。
+    前端定期回報的每幀解碼時間會記錄下來，可用 decode_stats() 查看。
+    """
+    value = _component(submit_form=submit_form, autostart=autostart, fps=fps, roi=list(roi),
+                       report_seconds=REPORT_SECONDS, key=key, default=None)
+    # 元件的值在重新執行之間保持不變，按序號只處理新的回報
+    if not value or value.get('seq') == st.session_state.get(f'{key}_seq'):
+        return None
+    st.session_state[f'{key}_seq'] = value.get('seq')
+    samples = value.get('decode_ms') or []
+    if samples:
+        record_decode_times(samples)
+        logger.info("條碼解碼 %d 幀，平均 %.1f ms，最長 %.1f ms",
+                    len(samples), float(np.mean(samples)), float(np.max(samples)))
+    return value.get('code')
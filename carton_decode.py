@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from process_pool import hide_app_main, new_pool
+
+MAX_SIDE = 1600         # 照片長邊先縮到此值以內，手機原圖直接解碼太慢
+ANGLES = (0, 45, -45)   # zbar 已能讀水平與垂直條碼，再補上斜放的角度
+TILE_GRID = 2           # 密集照片切成 2×2 的重疊區塊
+TILE_OVERLAP = 0.2
+TILE_SCALE = 2.0        # 區塊相對縮小後整張圖的放大倍數，讓小條碼也能被解碼
+MIN_TILE_SIDE = 800     # 原圖短邊小於此值時不切塊
+SYMBOLS = ('EAN13', 'EAN8', 'UPCA', 'UPCE', 'CODE128', 'CODE39', 'I25', 'CODABAR')
+
+
+def _rotations(gray):
+    """產生（影像, 原圖 → 影像的仿射矩陣）：整張圖的各個角度"""
+    import cv2
+
+    height, width = gray.shape
+    center = (width / 2, height / 2)
+    for angle in ANGLES:
+        if angle == 0:
+            yield gray, np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float64)
+            continue
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        # 擴大畫布以免旋轉後裁掉角落
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+        matrix[0, 2] += new_width / 2 - center[0]
+        matrix[1, 2] += new_height / 2 - center[1]
+        yield cv2.warpAffine(gray, matrix, (new_width, new_height), borderValue=255), matrix
+
+
+def _tiles(gray, scale=TILE_SCALE):
+    """產生按 scale 縮放的重疊區塊及其仿射矩陣，用於條碼很小的密集照片
+
+    區塊從原圖切出，scale 為相對原圖的縮放比例。
+    """
+    import cv2
+
+    height, width = gray.shape
+    if min(height, width) < MIN_TILE_SIDE:
+        return
+    tile_h = int(height / TILE_GRID * (1 + TILE_OVERLAP))
+    tile_w = int(width / TILE_GRID * (1 + TILE_OVERLAP))
+    for top in np.linspace(0, height - tile_h, TILE_GRID).astype(int):
+        for left in np.linspace(0, width - tile_w, TILE_GRID).astype(int):
+            tile = gray[top:top + tile_h, left:left + tile_w]
+            if scale != 1.0:
+                interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+                tile = cv2.resize(tile, None, fx=scale, fy=scale, interpolation=interpolation)
+            matrix = np.array([[scale, 0, -left * scale],
+                               [0, scale, -top * scale]], dtype=np.float64)
+            yield tile, matrix
+
+
+def _downscale(gray):
+    # 返回（縮小後的影像, 縮放比例）
+    import cv2
+
+    scale = min(1.0, MAX_SIDE / max(gray.shape))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+def _views(image):
+    """產生要解碼的（影像, 原圖 → 影像的仿射矩陣）
+
+    各角度在縮小後的整張圖上旋轉；區塊直接從原圖切出，保留縮小時丟失的細節，
+    縮放到縮小後整張圖的 TILE_SCALE 倍，每塊的像素數仍有上限。
+    """
+    small, scale = _downscale(image)
+    for view, matrix in _rotations(small):
+        # 先縮小再旋轉：把縮放併入矩陣的線性部分
+        matrix = matrix.copy()
+        matrix[:, :2] *= scale
+        yield view, matrix
+    yield from _tiles(image, TILE_SCALE * scale)
+
+
+def _is_duplicate(found, code, x, y, size):
+    # 與已找到的同一條碼距離很近時視為同一件
+    for other, other_x, other_y, other_size in found:
+        if other == code and np.hypot(x - other_x, y - other_y) < max(size, other_size) / 2:
+            return True
+    return False
+
+
+def decode_image(data):
+    """解碼一張照片中的所有條碼，返回 [(條碼, x, y)]，座標為原圖中的條碼中心
+
+    同一個實體條碼可能在多個角度或區塊中被讀到，按位置合併；
+    同一商品的多件（條碼相同、位置不同）會分別計數。
+    """
+    import cv2
+    from pyzbar import pyzbar
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("無法讀取圖片")
+
+    # 密集的整箱照片即使整張圖已讀到許多條碼，仍可能漏掉小條碼，所以區塊一律掃描
+    found = []
+    for view, matrix in _views(image):
+        inverse = cv2.invertAffineTransform(matrix)
+        for symbol in pyzbar.decode(view):
+            if symbol.type not in SYMBOLS:
+                continue
+            code = symbol.data.decode('ascii', errors='ignore')
+            points = np.array([[p.x, p.y, 1] for p in symbol.polygon], dtype=np.float64)
+            corners = points @ inverse.T
+            x, y = corners.mean(axis=0)
+            size = max(np.ptp(corners[:, 0]), np.ptp(corners[:, 1]), 20)
+            if not _is_duplicate(found, code, x, y, size):
+                found.append((code, x, y, size))
+    return [(code, float(x), float(y)) for code, x, y, _ in found]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes=None):
+    # 整個進程共用一個進程池，工作進程只在第一次提交時啟動
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_pool(processes)
+        return _pool
+
+
+def decode_images(images, processes=None):
+    """解碼多張照片；多於一張時交給共用的進程池並行，返回每張照片的結果列表"""
+    global _pool
+    if len(images) <= 1:
+        return [decode_image(data) for data in images]
+    pool = _get_pool(processes)
+    try:
+        with hide_app_main():
+            results = pool.map(decode_image, images)
+        return list(results)
+    except BrokenProcessPool:
+        # 工作進程異常結束後進程池不能再用，下次重新建立
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
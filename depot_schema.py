@@ -0,0 +1,137 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# dtype: 'barcode' 只保留數字的條碼字串；'text' 文字；'number' 數值；'status' 狀態文字
+Column = namedtuple('Column', ['name', 'dtype', 'aliases', 'default', 'required'])
+
+# 藥庫每日工作簿的欄位定義
+SCHEMA = [
+    Column('條碼', 'barcode', ('商品條碼', '國際條碼', 'Barcode', 'EAN'), None, True),
+    Column('門診位置', 'text', ('門診儲位',), '', False),
+    Column('藥庫位置', 'text', ('藥庫儲位', '儲位'), '', False),
+    Column('藥庫層數', 'text', ('層數', '層別'), '', False),
+    Column('藥品代碼', 'text', ('藥碼', '代碼'), '', False),
+    Column('藥品名稱', 'text', ('藥名', '品名'), None, True),
+    Column('單位', 'text', (), '', False),
+    Column('安全存量', 'number', ('安全庫存',), 0, False),
+    Column('現有庫存', 'number', ('現存量', '庫存'), 0, False),
+    Column('盤撥量', 'number', ('撥補量', '調撥量'), None, False),
+    Column('藥庫庫存', 'number', ('藥庫存量',), 0, False),
+    Column('最小包裝', 'number', ('包裝量', '包裝數量'), 1, False),
+    Column('最高庫存', 'number', ('最大庫存',), 0, False),
+    Column('撥補盒箱數', 'number', ('撥補盒數', '撥補箱數'), 0, False),
+    Column('檢貨狀態', 'status', (), '未檢貨', False),
+    Column('收貨狀態', 'status', (), '未收貨', False),
+]
+
+ALIASES = {alias: column.name for column in SCHEMA for alias in (column.name,) + column.aliases}
+
+REPORT_COLUMNS = ['欄位', '問題', '行數', '示例行']
+
+
+class SchemaError(ValueError):
+    """工作簿缺少必要欄位"""
+
+    def __init__(self, missing, report):
+        super().__init__(f"數據中缺少必要的列：{', '.join(missing)}")
+        self.missing = missing
+        self.report = report
+
+
+def _example_rows(mask, limit=5):
+    # Excel 行號：表頭佔第 1 行
+    return ', '.join(str(i + 2) for i in np.flatnonzero(mask)[:limit])
+
+
+def _normalize_barcode(series):
+    if pd.api.types.is_numeric_dtype(series):
+        # Excel 把條碼讀成數字時，避免出現 '4710000000000.0'
+        series = pd.to_numeric(series, errors='coerce').round().astype('Int64')
+    text = series.astype('string').str.strip()
+    text = text.str.replace(r'\.0+$', '', regex=True).str.replace(r'\D', '', regex=True)
+    return text.fillna('')
+
+
+def _normalize_text(series):
+    if pd.api.types.is_numeric_dtype(series):
+        # 整列都是整數時（含空格的數字列會被讀成浮點數），避免 '12345.0'
+        numbers = pd.to_numeric(series, errors='coerce')
+        valid = numbers.dropna()
+        if len(valid) and (valid % 1 == 0).all():
+            series = numbers.astype('Int64')
+    text = series.astype('string').str.strip()
+    # 文字與數字混合的列中，個別讀成浮點數的整數
+    return text.str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+
+
+def _normalize_number(series):
+    numbers = pd.to_numeric(series, errors='coerce')
+    valid = numbers.dropna()
+    if len(valid) and (valid % 1 == 0).all():
+        numbers = numbers.astype('Int64')
+    return numbers
+
+
+def normalize_workbook(df, keep_missing=()):
+    """按 SCHEMA 統一欄位名稱、類型與預設值，返回（DataFrame, 錯誤報告）
+
+    所有轉換都是整列的向量化操作；缺少必要欄位時拋出 SchemaError。
+    keep_missing 中的數值欄位不補預設值，空白（或整列缺少）保留為 NaN，
+    供需要分辨「沒有數據」與「0」的計算使用。
+    """
+    problems = []
+    sources = [str(c).strip() for c in df.columns]
+    df = df.set_axis([ALIASES.get(source, source) for source in sources], axis=1)
+    # 多個表頭對應到同一欄位時（例如同時有 條碼 與 EAN）只保留第一個，並在報告中列出被略過的表頭
+    duplicated = df.columns.duplicated()
+    for source, name in zip(np.array(sources)[duplicated], df.columns[duplicated]):
+        problems.append((name, f"重複欄位，已略過 '{source}'", len(df), ''))
+    df = df.loc[:, ~duplicated].copy()
+
+    missing = [column.name for column in SCHEMA if column.required and column.name not in df.columns]
+    if missing:
+        report = pd.DataFrame([(name, '缺少必要欄位', len(df), '') for name in missing], columns=REPORT_COLUMNS)
+        raise SchemaError(missing, report)
+
+    for column in SCHEMA:
+        if column.name in keep_missing:
+            column = column._replace(default=None)
+        if column.name not in df.columns:
+            if column.name in keep_missing:
+                df[column.name] = np.nan
+            elif column.default is not None:
+                df[column.name] = column.default
+            # 狀態列由系統補上，不算問題
+            if column.dtype != 'status':
+                problems.append((column.name, f"缺少欄位，已使用預設值 '{column.default}'"
+                                 if column.default is not None else '缺少欄位', len(df), ''))
+            continue
+
+        raw = df[column.name]
+        blank = (raw.astype('string').str.strip().fillna('') == '').to_numpy(dtype=bool)
+        if column.dtype == 'barcode':
+            values = _normalize_barcode(raw)
+            empty = (values == '').to_numpy(dtype=bool)
+            invalid = empty & ~blank
+        elif column.dtype == 'number':
+            values = _normalize_number(raw)
+            empty = values.isna().to_numpy(dtype=bool)
+            invalid = empty & ~blank
+        else:
+            values = _normalize_text(raw)
+            invalid = np.zeros(len(raw), dtype=bool)
+            empty = blank
+
+        if invalid.any():
+            problems.append((column.name, '無法解析的值', int(invalid.sum()), _example_rows(invalid)))
+        if column.required and empty.any():
+            problems.append((column.name, '必要欄位為空', int(empty.sum()), _example_rows(empty)))
+        if column.default is not None:
+            values = values.fillna(column.default)
+            if column.dtype in ('text', 'status'):
+                values = values.mask(values == '', column.default)
+        df[column.name] = values
+
+    return df, pd.DataFrame(problems, columns=REPORT_COLUMNS)
@@ -0,0 +1,128 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from drive_watcher import DriveChangeWatcher, LocalDriveService, WorkbookCache
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+PREFETCH_LIMIT = 3  # 背景預取並保留在快取中的最新工作簿數
+
+# 模組層級的單例：Streamlit 重新執行腳本時不會重新載入已匯入的模組，
+# 背景執行緒也能直接使用，不依賴 st.cache_resource 的腳本上下文
+_lock = threading.Lock()
+_warm_up_lock = threading.Lock()  # 與建立客戶端的 _lock 分開，冷啟動時不會阻塞頁面
+_service = None
+_watcher = None
+_warm_up_thread = None
+timings = {}
+
+
+def _load_service_account_info():
+    import streamlit as st
+    return st.secrets["gcp_service_account"]
+
+
+class _HttpPool:
+    """共享的 AuthorizedHttp 連線池
+
+    httplib2 的連線不是執行緒安全的，而客戶端同時被各會話的腳本執行緒與
+    背景監看執行緒使用：每次請求從池中借出一條閒置連線，用完歸還，
+    連線在不同的重新執行之間重用，同時使用的執行緒數就是連線數的上限。
+    """
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        import google_auth_httplib2
+        from googleapiclient.http import build_http
+
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=build_http())
+
+    def request(self, *args, **kwargs):
+        try:
+            http = self._idle.get_nowait()
+        except queue.Empty:
+            http = self._connect()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            self._idle.put(http)
+
+    def close(self):
+        while True:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            http.close()
+
+
+def _build_google_service(credentials):
+    from googleapiclient.discovery import build
+
+    # 使用套件內建的離線 discovery 文件，不需在啟動時連網下載
+    return build('drive', 'v3', http=_HttpPool(credentials),
+                 static_discovery=True, cache_discovery=False)
+
+
+def get_drive_service():
+    """延遲建立 Google Drive API 客戶端，只在第一次使用時匯入 googleapiclient"""
+    global _service
+    if _service is not None:
+        return _service
+    with _lock:
+        if _service is None:
+            start = time.perf_counter()
+            # 設定 DEPOT_LOCAL_DRIVE 時改用本地文件夾模擬 Drive（測試用）
+            if os.environ.get('DEPOT_LOCAL_DRIVE'):
+                _service = LocalDriveService(os.environ['DEPOT_LOCAL_DRIVE'])
+            else:
+                from google.oauth2 import service_account
+
+                credentials = service_account.Credentials.from_service_account_info(
+                    _load_service_account_info(), scopes=SCOPES)
+                _service = _build_google_service(credentials)
+            timings['drive_client'] = time.perf_counter() - start
+            logger.info("Drive 客戶端建立耗時 %.3fs", timings['drive_client'])
+    return _service
+
+
+def get_drive_watcher(folder_id):
+    """取得（必要時啟動）背景監看文件夾的 DriveChangeWatcher"""
+    global _watcher
+    if _watcher is not None:
+        return _watcher
+    service = get_drive_service()
+    with _lock:
+        if _watcher is None:
+            _watcher = DriveChangeWatcher(service, folder_id, WorkbookCache(limit=PREFETCH_LIMIT),
+                                          prefetch_limit=PREFETCH_LIMIT).start()
+    return _watcher
+
+
+def _warm_up(folder_id):
+    start = time.perf_counter()
+    try:
+        # 在背景先取得憑證並啟動監看器，由它預取最新的列表與工作簿
+        get_drive_watcher(folder_id)
+    except Exception:
+        logger.exception("預熱 Drive 連線失敗")
+    timings['warm_up'] = time.perf_counter() - start
+    logger.info("預熱完成，耗時 %.3fs", timings['warm_up'])
+
+
+def warm_up_in_background(folder_id):
+    """在背景執行緒預熱 Drive 客戶端與最新的文件列表，不阻塞首次渲染"""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(
+                target=_warm_up, args=(folder_id,), name='drive-warm-up', daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
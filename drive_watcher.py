@@ -0,0 +1,340 @@
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 保存 Drive changes.list 的 startPageToken，重啟後可從上次位置繼續
+TOKEN_PATH = '.drive_watch_token.json'
+
+CHANGE_FIELDS = ("nextPageToken, newStartPageToken, "
+                 "changes(fileId, removed, file(id, name, mimeType, parents, modifiedTime, trashed))")
+LIST_FIELDS = "files(id, name, mimeType, modifiedTime, parents)"
+
+EXCEL_MIME_TYPES = {
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.ms-excel',
+}
+
+
+def is_excel_file(file):
+    """判斷 Drive 文件是否為 Excel 工作簿"""
+    name = file.get('name', '').lower()
+    return file.get('mimeType') in EXCEL_MIME_TYPES or name.endswith(('.xlsx', '.xls'))
+
+
+def download_file_bytes(service, file_id):
+    """從 Google Drive 下載文件內容"""
+    if isinstance(service, LocalDriveService):
+        return service.download(file_id)
+
+    from googleapiclient.http import MediaIoBaseDownload
+
+    request = service.files().get_media(fileId=file_id)
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, request)
+    done = False
+    while done is False:
+        status, done = downloader.next_chunk()
+    return fh.getvalue()
+
+
+class WorkbookCache:
+    """跨會話共享的工作簿快取：文件夾列表與已解析的 DataFrame
+
+    limit 為最多保留的工作簿數，超過時丟棄 modifiedTime 最舊的；None 表示不限。
+    """
+
+    def __init__(self, limit=None):
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._listings = {}
+        self.limit = limit
+
+    def put(self, file, df):
+        with self._lock:
+            self._frames[file['id']] = (file.get('modifiedTime'), df)
+            if self.limit is not None and len(self._frames) > self.limit:
+                newest = sorted(self._frames, key=lambda file_id: self._frames[file_id][0] or '', reverse=True)
+                for file_id in newest[self.limit:]:
+                    del self._frames[file_id]
+
+    def get(self, file_id, modified_time=None):
+        with self._lock:
+            entry = self._frames.get(file_id)
+        if entry is None:
+            return None
+        cached_time, df = entry
+        if modified_time is not None and cached_time != modified_time:
+            return None
+        # 返回副本，避免不同會話互相修改
+        return df.copy()
+
+    def modified_time(self, file_id):
+        with self._lock:
+            entry = self._frames.get(file_id)
+        return entry[0] if entry else None
+
+    def discard(self, file_id):
+        with self._lock:
+            self._frames.pop(file_id, None)
+
+    def set_listing(self, folder_id, files):
+        with self._lock:
+            self._listings[folder_id] = list(files)
+
+    def listing(self, folder_id):
+        with self._lock:
+            files = self._listings.get(folder_id)
+        return list(files) if files is not None else None
+
+
+class DriveChangeWatcher:
+    """在背景輪詢 Drive changes.list，預先下載並解析文件夾中新增或修改的工作簿"""
+
+    def __init__(self, service, folder_id, cache, token_path=TOKEN_PATH,
+                 interval=60, prefetch_limit=3):
+        self.service = service
+        self.folder_id = folder_id
+        self.cache = cache
+        self.token_path = token_path
+        self.interval = interval
+        self.prefetch_limit = prefetch_limit
+        self.last_error = None
+        self._primed = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load_token(self):
+        try:
+            with open(self.token_path, encoding='utf-8') as f:
+                return json.load(f).get(self.folder_id)
+        except (OSError, ValueError):
+            return None
+
+    def _save_token(self, token):
+        try:
+            with open(self.token_path, encoding='utf-8') as f:
+                tokens = json.load(f)
+        except (OSError, ValueError):
+            tokens = {}
+        tokens[self.folder_id] = token
+        tmp_path = self.token_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.token_path)
+
+    def _fetch(self, file):
+        if not is_excel_file(file):
+            return False
+        cached_time = self.cache.modified_time(file['id'])
+        if cached_time is not None and cached_time == file.get('modifiedTime'):
+            return False
+        import pandas as pd
+
+        data = download_file_bytes(self.service, file['id'])
+        self.cache.put(file, pd.read_excel(io.BytesIO(data)))
+        return True
+
+    def refresh_listing(self):
+        results = self.service.files().list(
+            q=f"'{self.folder_id}' in parents and trashed = false",
+            orderBy='modifiedTime desc',
+            fields=LIST_FIELDS).execute()
+        files = results.get('files', [])
+        self.cache.set_listing(self.folder_id, files)
+        return files
+
+    def prime(self):
+        """列出文件夾並預取最新的幾個工作簿"""
+        files = self.refresh_listing()
+        workbooks = [file for file in files if is_excel_file(file)]
+        for file in workbooks[:self.prefetch_limit]:
+            self._fetch(file)
+        self._primed = True
+
+    def poll(self):
+        """處理一輪變更，返回已更新的文件 ID 列表"""
+        if not self._primed:
+            self.prime()
+
+        token = self._load_token()
+        if token is None:
+            token = self.service.changes().getStartPageToken().execute()['startPageToken']
+            self._save_token(token)
+            return []
+
+        updated = []
+        touched_folder = False
+        while token is not None:
+            response = self.service.changes().list(
+                pageToken=token, spaces='drive', fields=CHANGE_FIELDS).execute()
+            for change in response.get('changes', []):
+                file = change.get('file') or {}
+                if change.get('removed') or file.get('trashed'):
+                    listed = self.cache.listing(self.folder_id) or []
+                    if any(f['id'] == change['fileId'] for f in listed):
+                        touched_folder = True
+                    self.cache.discard(change['fileId'])
+                    continue
+                if self.folder_id not in file.get('parents', []):
+                    continue
+                touched_folder = True
+                if self._fetch(file):
+                    updated.append(file['id'])
+            if 'newStartPageToken' in response:
+                token = response['newStartPageToken']
+                break
+            token = response.get('nextPageToken')
+            if token is not None:
+                self._save_token(token)
+
+        if token is not None:
+            self._save_token(token)
+        if touched_folder:
+            self.refresh_listing()
+        return updated
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                # 背景執行緒不能呼叫 st.*：記錄到日誌並保存在 last_error 供頁面顯示，下一輪再試
+                logger.exception("輪詢 Drive 變更失敗")
+                self.last_error = e
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='drive-change-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class _Request:
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self):
+        return self._func()
+
+
+class _LocalFiles:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def list(self, q='', orderBy=None, pageSize=None, fields=None, **kwargs):
+        return _Request(lambda: self._drive._list(q, orderBy, pageSize))
+
+
+class _LocalChanges:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Request(lambda: {'startPageToken': self._drive._start_token()})
+
+    def list(self, pageToken, pageSize=100, **kwargs):
+        return _Request(lambda: self._drive._changes(pageToken, pageSize))
+
+
+class LocalDriveService:
+    """本地文件夾模擬的 Drive 服務，供測試與離線開發使用
+
+    root 下的每個子目錄視為一個 Drive 文件夾，子目錄名即文件夾 ID，
+    文件 ID 為 "文件夾ID/文件名"。
+    """
+
+    MIME_TYPES = {
+        '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        '.xls': 'application/vnd.ms-excel',
+    }
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._snapshot = {}
+        self._journal = []
+        self._scan()
+        self._journal.clear()
+
+    def files(self):
+        return _LocalFiles(self)
+
+    def changes(self):
+        return _LocalChanges(self)
+
+    def download(self, file_id):
+        with open(os.path.join(self.root, file_id), 'rb') as f:
+            return f.read()
+
+    def _meta(self, folder_id, name, mtime):
+        return {
+            'id': f"{folder_id}/{name}",
+            'name': name,
+            'mimeType': self.MIME_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream'),
+            'modifiedTime': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(mtime)) + f".{int(mtime * 1000) % 1000:03d}Z",
+            'parents': [folder_id],
+            'trashed': False,
+        }
+
+    def _scan(self):
+        # 比對快照，把新增、修改與刪除的文件寫入變更日誌
+        current = {}
+        for folder_id in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, folder_id)
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                if os.path.isfile(path):
+                    current[f"{folder_id}/{name}"] = self._meta(folder_id, name, os.path.getmtime(path))
+        for file_id, meta in current.items():
+            old = self._snapshot.get(file_id)
+            if old is None or old['modifiedTime'] != meta['modifiedTime']:
+                self._journal.append({'fileId': file_id, 'removed': False, 'file': meta})
+        for file_id in self._snapshot.keys() - current.keys():
+            self._journal.append({'fileId': file_id, 'removed': True})
+        self._snapshot = current
+
+    def _list(self, q, order_by, page_size):
+        with self._lock:
+            self._scan()
+            files = list(self._snapshot.values())
+        match = re.search(r"'([^']+)' in parents", q or '')
+        if match:
+            files = [file for file in files if match.group(1) in file['parents']]
+        if order_by and order_by.startswith('modifiedTime'):
+            files.sort(key=lambda file: file['modifiedTime'], reverse=order_by.endswith('desc'))
+        if page_size:
+            files = files[:page_size]
+        return {'files': files}
+
+    def _start_token(self):
+        with self._lock:
+            self._scan()
+            return str(len(self._journal))
+
+    def _changes(self, page_token, page_size):
+        with self._lock:
+            self._scan()
+            start = int(page_token)
+            end = min(start + page_size, len(self._journal))
+            response = {'changes': self._journal[start:end]}
+            if end < len(self._journal):
+                response['nextPageToken'] = str(end)
+            else:
+                response['newStartPageToken'] = str(end)
+            return response
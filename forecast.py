@@ -0,0 +1,187 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from depot_schema import normalize_workbook
+from process_pool import hide_app_main, new_pool
+
+ALPHA = 0.3   # 水準的平滑係數
+GAMMA = 0.1   # 星期效應的平滑係數
+COVER_DAYS = 1  # 撥補量要覆蓋的天數
+# 歷史數據中空白要保留為 NaN 的欄位：空白表示沒有數據，0 則是真實的庫存或上限
+MISSING_COLUMNS = ('現有庫存', '藥庫庫存', '最高庫存')
+
+_DATE_PATTERNS = [
+    # 西元年：20240815、2024-08-15、2024_08_15
+    (re.compile(r'(?<!\d)(20\d{2})[-_.]?(\d{2})[-_.]?(\d{2})(?!\d)'), 0),
+    # 民國年：1130815
+    (re.compile(r'(?<!\d)(1\d{2})(\d{2})(\d{2})(?!\d)'), 1911),
+]
+
+
+def workbook_date(file):
+    """從文件名（或修改時間）取得工作簿日期"""
+    for pattern, offset in _DATE_PATTERNS:
+        match = pattern.search(file.get('name', ''))
+        if match:
+            year, month, day = (int(part) for part in match.groups())
+            try:
+                return pd.Timestamp(year + offset, month, day)
+            except ValueError:
+                continue
+    if file.get('modifiedTime'):
+        return pd.Timestamp(file['modifiedTime']).tz_localize(None).normalize()
+    return None
+
+
+def load_history(files, read_excel, days=180):
+    """讀取最近 days 天的每日工作簿，合併為一張含 '日期' 列的長表
+
+    同一天有多份工作簿（重新上傳的 '20240802 (1).xlsx' 等）時只取最後修改的一份，
+    以免庫存與盤撥量被重複相加。
+    """
+    latest = {}
+    for file in files:
+        date = workbook_date(file)
+        if date is None:
+            continue
+        if date not in latest or file.get('modifiedTime', '') > latest[date].get('modifiedTime', ''):
+            latest[date] = file
+    if not latest:
+        return pd.DataFrame()
+    dated = sorted(latest.items(), key=lambda item: item[0])
+    cutoff = dated[-1][0] - pd.Timedelta(days=days - 1)
+    frames = []
+    for date, file in dated:
+        if date < cutoff:
+            continue
+        df, _ = normalize_workbook(read_excel(file['id'], file.get('modifiedTime')), keep_missing=MISSING_COLUMNS)
+        df['日期'] = date
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _pivot(codes, day, values, shape):
+    # 以 bincount 代替 pivot_table：同一 SKU 同一天的數值相加，沒有數據的格子為 NaN
+    flat = codes * shape[1] + day
+    present = ~np.isnan(values)
+    size = shape[0] * shape[1]
+    sums = np.bincount(flat[present], weights=values[present], minlength=size)
+    seen = np.bincount(flat[present], minlength=size) > 0
+    return np.where(seen, sums, np.nan).reshape(shape)
+
+
+def _float_column(df, column):
+    # 可空的 Int64 / Float64 列轉成以 NaN 表示空白的 float64 陣列
+    return pd.to_numeric(df[column], errors='coerce').astype(np.float64).to_numpy()
+
+
+def demand_matrix(history, key='藥品代碼'):
+    """把歷史長表轉成（SKU × 日期）的每日用量矩陣
+
+    用量以「前一日現有庫存 + 前一日盤撥量 − 當日現有庫存」估算，
+    缺少庫存數據時以盤撥量代替。
+    """
+    if key not in history.columns or (history[key] == '').all():
+        key = '條碼'
+    history = history[history[key] != '']
+    codes, skus = pd.factorize(history[key], sort=True)
+    start = history['日期'].min()
+    dates = pd.date_range(start, history['日期'].max(), freq='D')
+    day = (history['日期'] - start).dt.days.to_numpy()
+    shape = (len(skus), len(dates))
+
+    stock = _pivot(codes, day, _float_column(history, '現有庫存'), shape)
+    transfer = _pivot(codes, day, _float_column(history, '盤撥量'), shape)
+
+    previous_stock = np.full(shape, np.nan)
+    previous_stock[:, 1:] = stock[:, :-1]
+    previous_transfer = np.zeros(shape)
+    previous_transfer[:, 1:] = np.nan_to_num(transfer[:, :-1])
+    demand = np.clip(previous_stock + previous_transfer - stock, 0, None)
+    demand = np.where(np.isnan(demand), transfer, demand)
+    return pd.DataFrame(demand, index=skus, columns=dates)
+
+
+def _nanmean(values):
+    count = np.count_nonzero(~np.isnan(values), axis=1)
+    total = np.nansum(values, axis=1)
+    return np.divide(total, count, out=np.zeros(len(values)), where=count > 0)
+
+
+def fit_forecast(demand, alpha=ALPHA, gamma=GAMMA):
+    """加法星期效應的指數平滑，所有 SKU 同時計算，返回下一日的預測用量
+
+    demand 為（SKU × 日期）矩陣，缺失值視為當日未知，不更新狀態。
+    """
+    values = demand.to_numpy(dtype=np.float64)
+    skus, days = values.shape
+    dows = demand.columns.dayofweek.to_numpy()
+
+    # 以整段期間的平均值與各星期的偏差作初始值
+    level = _nanmean(values)
+    season = np.zeros((skus, 7))
+    for dow in range(7):
+        columns = values[:, dows == dow]
+        if columns.shape[1]:
+            season[:, dow] = _nanmean(columns) - level
+
+    # 只在時間軸上迴圈，每一步都對全部 SKU 做向量運算
+    for t in range(days):
+        observed = values[:, t]
+        known = ~np.isnan(observed)
+        dow = dows[t]
+        new_level = alpha * (observed - season[:, dow]) + (1 - alpha) * level
+        new_season = gamma * (observed - new_level) + (1 - gamma) * season[:, dow]
+        level = np.where(known, new_level, level)
+        season[:, dow] = np.where(known, new_season, season[:, dow])
+
+    next_dow = (demand.columns[-1] + pd.Timedelta(days=1)).dayofweek if days else 0
+    forecast = np.clip(level + season[:, next_dow], 0, None)
+    return pd.Series(forecast, index=demand.index, name='預測用量')
+
+
+def propose_transfers(latest, forecast, key='藥品代碼', cover_days=COVER_DAYS):
+    """依預測用量計算明日的盤撥量與撥補盒箱數
+
+    最高庫存與藥庫庫存為 NaN 時視為沒有數據、不設上限；為 0 時是真實的上限。
+    """
+    if key not in latest.columns or (latest[key] == '').all():
+        key = '條碼'
+    df = latest.copy()
+    predicted = df[key].map(forecast).astype(np.float64).fillna(0).to_numpy()
+    stock = np.nan_to_num(_float_column(df, '現有庫存'))
+    safety = np.nan_to_num(_float_column(df, '安全存量'))
+    maximum = _float_column(df, '最高庫存')
+    depot = _float_column(df, '藥庫庫存')
+    pack = np.nan_to_num(_float_column(df, '最小包裝'), nan=1)
+    pack = np.where(pack > 0, pack, 1)
+
+    needed = predicted * cover_days + safety - stock
+    # 有最高庫存時不超過上限；有藥庫庫存數據時不超過藥庫可撥數量
+    needed = np.where(np.isnan(maximum), needed, np.minimum(needed, maximum - stock))
+    needed = np.where(np.isnan(depot), needed, np.minimum(needed, depot))
+    boxes = np.ceil(np.clip(needed, 0, None) / pack)
+
+    df['預測用量'] = np.round(predicted, 1)
+    df['撥補盒箱數'] = boxes.astype(np.int64)
+    df['盤撥量'] = (boxes * pack).astype(np.int64)
+    return df
+
+
+def forecast_site(history, key='藥品代碼'):
+    """單一院區：從歷史長表算出最新一天的建議撥補量"""
+    demand = demand_matrix(history, key)
+    forecast = fit_forecast(demand)
+    latest = history[history['日期'] == history['日期'].max()]
+    return propose_transfers(latest, forecast, key)
+
+
+def forecast_sites(histories, processes=None):
+    """多個院區以進程池並行預測，histories 為 {院區: 歷史長表}"""
+    names = list(histories)
+    with new_pool(processes) as pool:
+        with hide_app_main():
+            results = pool.map(forecast_site, [histories[name] for name in names])
+        return dict(zip(names, results))
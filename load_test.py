@@ -0,0 +1,173 @@
+"""模擬多位檢貨／收貨人員同時使用，量測掃描延遲並輸出容量曲線
+
+用法：
+    python load_test.py --users 1 2 4 8 16 --scans 20 --rows 500
+
+每位使用者是一個獨立的 Streamlit 會話（streamlit.testing 的 AppTest），
+Google Drive 以本地文件夾（LocalDriveService）代替。AppTest 每次操作都會
+重新執行整個腳本（不區分片段），因此量到的延遲是保守的上限。
+
+AppTest 每次執行都會建立並清除全域的 Runtime，不能在多個執行緒中同時執行，
+所以所有腳本執行都經過同一把鎖排隊：並發是模擬的，各會話的整頁重新執行
+依序進行。延遲包含排隊時間；吞吐量以持鎖執行的總時間（忙碌時間）計算，
+不含使用者的掃描間隔。加上 --saturation 時另跑一輪沒有間隔的飽和測試。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Medicine_depot copy.py')
+# 須與應用中的 DRIVE_FOLDER_ID 相同，LocalDriveService 以子目錄名作為文件夾 ID
+FOLDER_ID = '1LdDnfuu3N8v9PkePOhuJd0Ffv_FBQsMA'
+
+CONCURRENCY_NOTE = '模擬：AppTest 整頁重新執行，依序排隊'
+
+_run_lock = threading.Lock()
+
+
+def make_workbook(root, rows, seed=0):
+    """在本地假 Drive 中建立一份當日工作簿，返回其中的條碼列表"""
+    rng = np.random.default_rng(seed)
+    barcodes = [str(4710000000000 + i) for i in rng.choice(10 ** 9, size=rows, replace=False)]
+    df = pd.DataFrame({
+        '條碼': barcodes,
+        '藥庫位置': [f"{chr(65 + i % 6)}-{i % 20:02d}" for i in range(rows)],
+        '藥庫層數': rng.integers(1, 6, size=rows),
+        '藥品代碼': [f"D{i:05d}" for i in range(rows)],
+        '藥品名稱': [f"測試藥品 {i}" for i in range(rows)],
+        '盤撥量': rng.integers(1, 4, size=rows),
+        '藥庫庫存': rng.integers(10, 200, size=rows),
+        '最小包裝': 1,
+    })
+    folder = os.path.join(root, FOLDER_ID)
+    os.makedirs(folder, exist_ok=True)
+    df.to_excel(os.path.join(folder, time.strftime('%Y%m%d') + '.xlsx'), index=False)
+    return barcodes
+
+
+def _memory_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def simulate_user(role, barcodes, scans, think, invalid_rate, seed, latencies, busy, errors, sessions, app_path):
+    from streamlit.testing.v1 import AppTest
+
+    rnd = random.Random(seed)
+    try:
+        at = AppTest.from_file(app_path, default_timeout=60)
+        sessions.append(at)  # 保留會話直到量測記憶體
+        with _run_lock:
+            at.run()
+            at.sidebar.radio[0].set_value('檢貨' if role == 'pick' else '收貨').run()
+        for _ in range(scans):
+            time.sleep(rnd.expovariate(1 / think) if think > 0 else 0)
+            barcode = rnd.choice(barcodes) if rnd.random() >= invalid_rate else '0000000000000'
+            at.text_input[0].input(barcode)
+            submit = next(button for button in at.button if button.label == '檢查商品')
+            start = time.perf_counter()
+            with _run_lock:
+                run_start = time.perf_counter()
+                submit.click().run()
+                busy.append(time.perf_counter() - run_start)
+            latencies.append(time.perf_counter() - start)
+            if at.exception:
+                errors.append(str(at.exception[0].value))
+    except Exception as e:
+        errors.append(f"{role}: {e}")
+
+
+def run_level(users, args, barcodes, think):
+    """以 users 位同時使用者、平均掃描間隔 think 秒跑一輪，返回該並發數下的統計"""
+    latencies, busy, errors, sessions = [], [], [], []
+    receivers = int(round(users * args.receivers))
+    roles = ['receive'] * receivers + ['pick'] * (users - receivers)
+    baseline = _memory_bytes()
+    threads = [
+        threading.Thread(target=simulate_user, args=(
+            role, barcodes, args.scans, think, args.invalid, args.seed + i,
+            latencies, busy, errors, sessions, args.app))
+        for i, role in enumerate(roles)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    memory = max(_memory_bytes() - baseline, 0)
+
+    values = np.array(latencies) if latencies else np.array([np.nan])
+    p50, p95, p99 = (float(value) for value in np.percentile(values, [50, 95, 99]))
+    for error in errors[:3]:
+        print(f"錯誤：{error}", file=sys.stderr)
+    return {
+        '使用者數': users,
+        '掃描間隔(s)': think,
+        '掃描次數': len(latencies),
+        'p50(ms)': round(p50 * 1000, 1),
+        'p95(ms)': round(p95 * 1000, 1),
+        'p99(ms)': round(p99 * 1000, 1),
+        # 每秒忙碌時間可完成的重新執行次數，不含使用者的掃描間隔
+        '每秒重新執行': round(len(busy) / sum(busy), 2) if busy else 0.0,
+        '每會話記憶體(MB)': round(memory / users / 2 ** 20, 2),
+        '錯誤': len(errors),
+        '並發': CONCURRENCY_NOTE,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="檢貨／收貨流程的並發壓力測試")
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="要測試的並發使用者數")
+    parser.add_argument('--scans', type=int, default=20, help="每位使用者的掃描次數")
+    parser.add_argument('--rows', type=int, default=500, help="工作簿的行數")
+    parser.add_argument('--think', type=float, default=2.0, help="兩次掃描之間的平均間隔（秒）")
+    parser.add_argument('--invalid', type=float, default=0.05, help="無效條碼的比例")
+    parser.add_argument('--saturation', action='store_true', help="另以最大使用者數、無掃描間隔跑一輪飽和測試")
+    parser.add_argument('--receivers', type=float, default=0.5, help="收貨人員佔使用者的比例")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--app', default=APP_PATH, help="要測試的 Streamlit 腳本")
+    parser.add_argument('--csv', help="把容量曲線寫入 CSV 文件")
+    args = parser.parse_args(argv)
+    args.app = os.path.abspath(args.app)
+    if args.csv:
+        args.csv = os.path.abspath(args.csv)
+
+    with tempfile.TemporaryDirectory() as root:
+        barcodes = make_workbook(root, args.rows, args.seed)
+        os.environ['DEPOT_LOCAL_DRIVE'] = root
+        os.environ['DEPOT_WARMUP'] = '0'
+        # 監看器的 startPageToken 文件寫到臨時目錄
+        os.chdir(root)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(args.app)))
+
+        # 先跑一次，讓模組匯入與 Drive 監看器的初始化不計入第一個並發等級
+        simulate_user('pick', barcodes, 1, 0, 0, args.seed, [], [], [], [], args.app)
+
+        levels = [(users, args.think) for users in args.users]
+        if args.saturation:
+            levels.append((max(args.users), 0.0))
+        rows = []
+        for users, think in levels:
+            row = run_level(users, args, barcodes, think)
+            print(row, flush=True)
+            rows.append(row)
+
+    curve = pd.DataFrame(rows)
+    print(curve.to_string(index=False))
+    if args.csv:
+        curve.to_csv(args.csv, index=False, encoding='utf-8-sig')
+    return curve
+
+
+if __name__ == '__main__':
+    main()
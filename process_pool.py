@@ -0,0 +1,46 @@
+import contextlib
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+# 預先匯入到 forkserver 的模組，之後 fork 出的工作進程不必各自匯入
+PRELOAD = ['carton_decode', 'forecast']
+
+_main_lock = threading.Lock()
+
+
+def get_context():
+    # Streamlit 伺服器有多個執行緒在跑，fork 可能複製到被其他執行緒持有的鎖，
+    # 所以用 forkserver（不支援時用 spawn）
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # 預設的預載列表是 ['__main__']，會讓 forkserver 匯入 app 腳本
+        context.set_forkserver_preload(PRELOAD)
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def new_pool(processes=None):
+    """建立使用 forkserver / spawn 的進程池；提交工作時要包在 hide_app_main() 中"""
+    return ProcessPoolExecutor(max_workers=processes, mp_context=get_context())
+
+
+@contextlib.contextmanager
+def hide_app_main():
+    """提交工作（即啟動工作進程）期間把 __main__ 換成空模組
+
+    Streamlit 把 app 腳本裝成 sys.modules['__main__']，forkserver 與 spawn 的
+    工作進程啟動時會把它當作 __mp_main__ 重新執行一次；工作函數都放在普通
+    模組中，工作進程不需要 app 腳本。
+    """
+    with _main_lock:
+        main = sys.modules['__main__']
+        placeholder = sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            yield
+        finally:
+            # 期間若有腳本開始重新執行並換上新的 __main__，保留它
+            if sys.modules['__main__'] is placeholder:
+                sys.modules['__main__'] = main
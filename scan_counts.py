@@ -0,0 +1,191 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+PICK = 'pick'
+RECEIVE = 'receive'
+
+STATUS_COLUMNS = {PICK: '檢貨狀態', RECEIVE: '收貨狀態'}
+COUNT_COLUMNS = {PICK: '檢貨數量', RECEIVE: '收貨數量'}
+STATUS_LABELS = {
+    PICK: ('未檢貨', '部分檢貨', '已檢貨'),
+    RECEIVE: ('未收貨', '部分收貨', '已收貨'),
+}
+
+
+def normalize_barcode(barcode):
+    """統一條碼格式（去空白、補零至 13 位），用於查找"""
+    return str(barcode).strip().zfill(13)
+
+
+def _numeric_column(df, column, default):
+    if column not in df.columns:
+        return np.full(len(df), default, dtype=np.float64)
+    values = pd.to_numeric(df[column], errors='coerce').astype(np.float64)
+    return values.fillna(default).to_numpy(copy=True)
+
+
+class ScanCounter:
+    """以緊湊陣列記錄每一行的檢貨與收貨數量
+
+    每次掃描加上一個最小包裝（缺少時為 1 個單位），數量達到盤撥量
+    （空白時為 撥補盒箱數 × 最小包裝，兩者皆無時為一個包裝）才算完成。
+    盤撥量明確為 0 的行不需檢貨，不計入進度。
+    """
+
+    def __init__(self, df):
+        # 同一計數器由多個會話（檢貨與收貨裝置）同時使用
+        self._lock = threading.RLock()
+        # 最小包裝有小數時進位，確保每次掃描至少加 1
+        step = np.ceil(_numeric_column(df, '最小包裝', 1))
+        step = np.maximum(step, 1)
+        boxes = _numeric_column(df, '撥補盒箱數', 0)
+        target = _numeric_column(df, '盤撥量', np.nan)
+        blank = np.isnan(target)
+        target = np.where(blank, boxes * step, target)
+        # 盤撥量空白且沒有盒箱數時，以一個包裝為目標，避免讀入即算完成
+        target = np.where(blank & (np.rint(target) <= 0), step, target)
+
+        self.step = np.maximum(step.astype(np.int32), 1)
+        self.target = np.maximum(np.rint(target), 0).astype(np.int32)
+        # 讀入已有的數量或狀態列，以便從備份繼續
+        self.counts = {}
+        for kind in (PICK, RECEIVE):
+            counts = np.zeros(len(df), dtype=np.int32)
+            if COUNT_COLUMNS[kind] in df.columns:
+                counts = _numeric_column(df, COUNT_COLUMNS[kind], 0).astype(np.int32)
+            elif STATUS_COLUMNS[kind] in df.columns:
+                done = (df[STATUS_COLUMNS[kind]] == STATUS_LABELS[kind][2]).to_numpy()
+                counts = np.where(done, self.target, 0).astype(np.int32)
+            self.counts[kind] = counts
+
+        # 條碼 → 行位置，掃描時 O(1) 查找
+        self.rows = {}
+        if '條碼' in df.columns:
+            for position, barcode in enumerate(df['條碼'].astype(str).str.strip().str.zfill(13)):
+                self.rows.setdefault(barcode, []).append(position)
+
+    def __len__(self):
+        return len(self.target)
+
+    def lookup(self, barcode):
+        return self.rows.get(normalize_barcode(barcode), [])
+
+    def scan(self, position, kind=PICK, packs=1):
+        """在指定行加上 packs 個最小包裝，返回新的數量"""
+        with self._lock:
+            counts = self.counts[kind]
+            counts[position] += self.step[position] * packs
+            return int(counts[position])
+
+    def scan_barcode(self, barcode, kind=PICK, packs=1):
+        """按條碼掃描；同一條碼有多行時優先累加尚未完成的行。找不到時返回 None"""
+        positions = self.lookup(barcode)
+        if not positions:
+            return None
+        with self._lock:
+            counts = self.counts[kind]
+            position = next((p for p in positions if counts[p] < self.target[p]), positions[0])
+            self.scan(position, kind, packs)
+        return position
+
+    def scan_many(self, barcodes, kind=PICK):
+        """一次計入多個條碼（每出現一次加一個最小包裝），返回（各行增加的包數, 找不到的條碼）"""
+        codes, occurrences = np.unique([normalize_barcode(b) for b in barcodes], return_counts=True)
+        positions, packs, missing = [], [], []
+        with self._lock:
+            counts = self.counts[kind]
+            for code, times in zip(codes, occurrences):
+                rows = self.rows.get(code)
+                if not rows:
+                    missing.append(code.lstrip('0'))
+                    continue
+                positions.append(next((p for p in rows if counts[p] < self.target[p]), rows[0]))
+                packs.append(times)
+            positions = np.array(positions, dtype=np.intp)
+            packs = np.array(packs, dtype=np.int32)
+            np.add.at(counts, positions, self.step[positions] * packs)
+        return dict(zip(positions.tolist(), packs.tolist())), missing
+
+    def status(self, position, kind=PICK):
+        pending, partial, done = STATUS_LABELS[kind]
+        count = self.counts[kind][position]
+        if count >= self.target[position]:
+            return done
+        return partial if count > 0 else pending
+
+    def statuses(self, kind=PICK):
+        pending, partial, done = STATUS_LABELS[kind]
+        counts = self.counts[kind]
+        return np.where(counts >= self.target, done, np.where(counts > 0, partial, pending))
+
+    def progress(self, kind=PICK):
+        """返回（已完成行數, 需處理的行數），盤撥量為 0 的行不計入"""
+        required = self.target > 0
+        done = np.count_nonzero(required & (self.counts[kind] >= self.target))
+        return int(done), int(np.count_nonzero(required))
+
+    def apply_to(self, df):
+        """把數量與狀態寫回 DataFrame 以供顯示與備份"""
+        for kind in (PICK, RECEIVE):
+            df[COUNT_COLUMNS[kind]] = self.counts[kind]
+            df[STATUS_COLUMNS[kind]] = self.statuses(kind)
+        return df
+
+
+MAX_COUNTERS = 8  # 最多保留的工作簿版本數，超過時丟棄最久未使用的
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_shared_counter(key, df):
+    """按工作簿取得所有會話共享的 ScanCounter；行數不同（工作簿已更新）時重新建立
+
+    檢貨與收貨通常在不同的裝置上進行，共用同一份計數才能對帳。
+    """
+    with _counters_lock:
+        counter = _counters.pop(key, None)
+        if counter is None or len(counter) != len(df):
+            counter = ScanCounter(df)
+        # 重新插入到末尾，字典順序即為最近使用的順序
+        _counters[key] = counter
+        while len(_counters) > MAX_COUNTERS:
+            del _counters[next(iter(_counters))]
+        return counter
+
+
+def reconcile(df, counter):
+    """按藥品代碼比較檢貨與收貨數量，列出短收與溢收的品項
+
+    計數目標為計數器的目標數量（盤撥量，空白時按盒箱數或一個包裝推算）。
+    """
+    key = '藥品代碼'
+    if key not in df.columns or (df[key].astype(str).str.strip() == '').all():
+        key = '條碼'
+    values = df[key].astype(str).str.strip()
+    if key != '條碼' and '條碼' in df.columns:
+        # 個別缺少藥品代碼的行改以條碼區分，不要全部歸到同一個空白代碼
+        values = values.mask(values == '', df['條碼'].astype(str))
+    codes, uniques = pd.factorize(values, sort=True)
+    size = len(uniques)
+
+    # 以 bincount 一次彙總所有行
+    picked = np.bincount(codes, weights=counter.counts[PICK], minlength=size).astype(np.int64)
+    received = np.bincount(codes, weights=counter.counts[RECEIVE], minlength=size).astype(np.int64)
+    target = np.bincount(codes, weights=counter.target, minlength=size).astype(np.int64)
+    diff = received - picked
+
+    report = pd.DataFrame({
+        key: uniques,
+        '計數目標': target,
+        COUNT_COLUMNS[PICK]: picked,
+        COUNT_COLUMNS[RECEIVE]: received,
+        '差異': diff,
+    })
+    if '藥品名稱' in df.columns:
+        first_row = np.unique(codes, return_index=True)[1]
+        report.insert(1, '藥品名稱', df['藥品名稱'].to_numpy()[first_row])
+    report['結果'] = np.where(diff < 0, '短收', np.where(diff > 0, '溢收', '相符'))
+    return report[diff != 0].reset_index(drop=True)
@@ -0,0 +1,241 @@
+// 條碼解碼 Web Worker：主執行緒只負責擷取畫面，解碼全部在這裡進行
+// 瀏覽器有原生 BarcodeDetector 時優先使用，否則用下面的 EAN-13 / EAN-8 掃描線解碼器
+// （其他格式只有原生解碼器能讀，介面上會提示）
+
+// 各數字的 L 編碼寬度（空、條、空、條）；R 編碼寬度相同、顏色相反，G 編碼為 L 的倒序
+var WIDTHS = [
+    [3, 2, 1, 1], [2, 2, 2, 1], [2, 1, 2, 2], [1, 4, 1, 1], [1, 1, 3, 2],
+    [1, 2, 3, 1], [1, 1, 1, 4], [1, 3, 1, 2], [1, 2, 1, 3], [3, 1, 1, 2]
+];
+// EAN-13 的第一位數字由左半部六個數字的 L/G 組合決定
+var FIRST_DIGIT = ['LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG', 'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL'];
+var MAX_DIGIT_ERROR = 1.5;  // 一個數字四段寬度與標準寬度的總偏差上限（單位：模組）
+var QUIET_ZONE = 5;         // 條碼兩側空白至少要有的模組數
+var SCANLINES = 15;         // 每幀最多嘗試的掃描線數
+var HYSTERESIS = 0.05;       // 亮度偏離局部平均超過掃描線對比的此比例才切換黑白，避免空白區的雜訊被讀成細條
+
+// 與拍照收貨（carton_decode.SYMBOLS）相同的格式
+var FORMATS = ['ean_13', 'ean_8', 'upc_a', 'upc_e', 'code_128', 'code_39', 'itf', 'codabar'];
+
+var detector = null;
+
+function isDark(firstDark, index) {
+    return (index % 2 === 0) === firstDark;
+}
+
+// 取一條掃描線（上下共三行平均）的亮度
+function scanline(pixels, width, height, y) {
+    var row = new Float32Array(width);
+    for (var dy = -1; dy <= 1; dy++) {
+        var line = Math.min(height - 1, Math.max(0, y + dy));
+        for (var x = 0, i = line * width * 4; x < width; x++, i += 4) {
+            row[x] += pixels[i] * 0.299 + pixels[i + 1] * 0.587 + pixels[i + 2] * 0.114;
+        }
+    }
+    return row;
+}
+
+// 以局部平均作門檻二值化，返回各段的寬度與第一段是否為黑條
+// 邊緣位置在相鄰兩點之間按亮度內插，條碼很小（每模組約兩個像素）時也能分辨寬度
+function toRuns(row) {
+    var width = row.length;
+    var radius = Math.max(8, Math.round(width / 32));
+    var prefix = new Float64Array(width + 1);
+    var lowest = Infinity;
+    var highest = -Infinity;
+    for (var x = 0; x < width; x++) {
+        prefix[x + 1] = prefix[x] + row[x];
+        lowest = Math.min(lowest, row[x]);
+        highest = Math.max(highest, row[x]);
+    }
+    var band = (highest - lowest) * HYSTERESIS;
+    var widths = [];
+    var firstDark = null;
+    var current = null;
+    var edge = 0;
+    var crossing = 0;
+    var previous = 0;
+    for (x = 0; x < width; x++) {
+        var left = Math.max(0, x - radius);
+        var right = Math.min(width, x + radius + 1);
+        var threshold = (prefix[right] - prefix[left]) / (right - left);
+        var level = row[x] - threshold;
+        if (x > 0 && (level < 0) !== (previous < 0)) {
+            // 最近一次越過局部平均的位置，切換黑白時以此作為邊緣
+            crossing = x - level / (level - previous);
+        }
+        previous = level;
+        if (firstDark === null) {
+            firstDark = level < 0;
+            current = firstDark;
+        } else if (current ? level > band : level < -band) {
+            widths.push(crossing - edge);
+            edge = crossing;
+            current = !current;
+        }
+    }
+    widths.push(width - edge);
+    return {widths: widths, firstDark: firstDark};
+}
+
+// 比對四段寬度，返回 {digit, parity} 或 null
+function matchDigit(widths, start, withG) {
+    var sum = widths[start] + widths[start + 1] + widths[start + 2] + widths[start + 3];
+    var best = null;
+    var bestError = MAX_DIGIT_ERROR;
+    for (var digit = 0; digit < 10; digit++) {
+        var pattern = WIDTHS[digit];
+        var errorL = 0;
+        var errorG = 0;
+        for (var k = 0; k < 4; k++) {
+            var module = widths[start + k] * 7 / sum;
+            errorL += Math.abs(module - pattern[k]);
+            errorG += Math.abs(module - pattern[3 - k]);
+        }
+        if (errorL < bestError) {
+            bestError = errorL;
+            best = {digit: digit, parity: 'L'};
+        }
+        if (withG && errorG < bestError) {
+            bestError = errorG;
+            best = {digit: digit, parity: 'G'};
+        }
+    }
+    return best;
+}
+
+function isGuard(widths, start, count, module) {
+    for (var k = start; k < start + count; k++) {
+        if (widths[k] < module * 0.4 || widths[k] > module * 2) {
+            return false;
+        }
+    }
+    return true;
+}
+
+function validChecksum(code) {
+    var sum = 0;
+    for (var k = code.length - 2, weight = 3; k >= 0; k--, weight = 4 - weight) {
+        sum += Number(code[k]) * weight;
+    }
+    return (10 - sum % 10) % 10 === Number(code[code.length - 1]);
+}
+
+// 從第 start 段（起始護線的第一條黑條）開始嘗試讀 digits 位數（EAN-13 為 12、EAN-8 為 8）
+function readEan(widths, start, digits) {
+    var half = digits / 2;
+    var count = 3 + half * 4 + 5 + half * 4 + 3;
+    if (start < 1 || start + count >= widths.length) {
+        return null;
+    }
+    var total = 0;
+    for (var k = start; k < start + count; k++) {
+        total += widths[k];
+    }
+    var module = total / (digits * 7 + 11);
+    if (widths[start - 1] < module * QUIET_ZONE || widths[start + count] < module * QUIET_ZONE) {
+        return null;
+    }
+    var middle = start + 3 + half * 4;
+    if (!isGuard(widths, start, 3, module) || !isGuard(widths, middle, 5, module)
+        || !isGuard(widths, middle + 5 + half * 4, 3, module)) {
+        return null;
+    }
+
+    var code = '';
+    var parity = '';
+    for (var d = 0; d < half; d++) {
+        var left = matchDigit(widths, start + 3 + d * 4, digits === 12);
+        if (!left) {
+            return null;
+        }
+        code += left.digit;
+        parity += left.parity;
+    }
+    for (d = 0; d < half; d++) {
+        var right = matchDigit(widths, middle + 5 + d * 4, false);
+        if (!right) {
+            return null;
+        }
+        code += right.digit;
+    }
+    if (digits === 12) {
+        var first = FIRST_DIGIT.indexOf(parity);
+        if (first < 0) {
+            return null;
+        }
+        code = first + code;
+    }
+    return validChecksum(code) ? code : null;
+}
+
+function decodeRuns(runs) {
+    var widths = runs.widths;
+    for (var start = 1; start < widths.length; start++) {
+        if (!isDark(runs.firstDark, start)) {
+            continue;
+        }
+        var code = readEan(widths, start, 12) || readEan(widths, start, 8);
+        if (code) {
+            return code;
+        }
+    }
+    return null;
+}
+
+// 從中間向上下兩側逐條嘗試掃描線，條碼倒置時把各段反轉再讀一次
+function decodeImage(pixels, width, height) {
+    var step = height / (SCANLINES + 1);
+    for (var n = 0; n < SCANLINES; n++) {
+        var offset = Math.ceil(n / 2) * (n % 2 ? 1 : -1);
+        var y = Math.round(height / 2 + offset * step);
+        if (y < 0 || y >= height) {
+            continue;
+        }
+        var runs = toRuns(scanline(pixels, width, height, y));
+        if (runs.widths.length < 43) {
+            continue;
+        }
+        var code = decodeRuns(runs);
+        if (!code) {
+            var last = runs.widths.length - 1;
+            code = decodeRuns({widths: runs.widths.slice().reverse(), firstDark: isDark(runs.firstDark, last)});
+        }
+        if (code) {
+            return code;
+        }
+    }
+    return null;
+}
+
+function reply(code, start, engine) {
+    self.postMessage({code: code, ms: performance.now() - start, engine: engine});
+}
+
+if (self.BarcodeDetector) {
+    self.BarcodeDetector.getSupportedFormats().then(function (formats) {
+        var supported = FORMATS.filter(function (format) {
+            return formats.indexOf(format) >= 0;
+        });
+        if (supported.length) {
+            detector = new self.BarcodeDetector({formats: supported});
+        }
+    }).catch(function () {});
+}
+
+self.onmessage = function (event) {
+    var data = event.data;
+    var start = performance.now();
+    var pixels = new Uint8ClampedArray(data.pixels);
+    if (!detector) {
+        reply(decodeImage(pixels, data.width, data.height), start, 'js');
+        return;
+    }
+    detector.detect(new ImageData(pixels, data.width, data.height)).then(function (codes) {
+        reply(codes.length ? codes[0].rawValue : null, start, 'native');
+    }, function () {
+        // 原生解碼失敗時改用 JS 解碼器
+        detector = null;
+        reply(decodeImage(pixels, data.width, data.height), start, 'js');
+    });
+};
@@ -0,0 +1,228 @@
+// 攝像頭條碼掃描元件：以較低幀率擷取畫面中央的解碼區域，交給 Web Worker 解碼
+(function () {
+    var VERSION = '2';        // 與 index.html、sw.js 中的版本號一致
+    var MAX_WIDTH = 640;      // 解碼區域縮放後的最大寬度
+    var CONFIRM_FRAMES = 2;   // 連續幾幀讀到同一條碼才算掃描成功
+    var RESUBMIT_MS = 2000;   // 同一條碼在此時間內不重複提交
+
+    var args = {fps: 8, roi: [0.8, 0.35], submit_form: true, report_seconds: 10, autostart: false};
+    var video = document.getElementById('video');
+    var roiBox = document.getElementById('roi');
+    var button = document.getElementById('start-scanner');
+    var status = document.getElementById('scanner-status');
+    var note = document.getElementById('scanner-note');
+    var canvas = document.createElement('canvas');
+    var context = canvas.getContext('2d', {willReadFrequently: true});
+
+    var worker = null;
+    var stream = null;
+    var scannerIsRunning = false;
+    var busy = false;
+    var frameTimer = null;
+    var reportTimer = null;
+    var samples = [];
+    var seq = 0;
+    var candidate = null;
+    var candidateFrames = 0;
+    var lastCode = null;
+    var lastCodeTime = 0;
+    var pendingCode = null;
+    var autostarted = false;
+    var engine = null;
+
+    // Streamlit 自訂元件的訊息協定
+    function send(type, data) {
+        var message = {isStreamlitMessage: true, type: type};
+        for (var name in data) {
+            message[name] = data[name];
+        }
+        window.parent.postMessage(message, '*');
+    }
+
+    function setFrameHeight() {
+        send('streamlit:setFrameHeight', {height: document.body.scrollHeight + 10});
+    }
+
+    window.addEventListener('message', function (event) {
+        if (event.data && event.data.type === 'streamlit:render') {
+            var renderArgs = event.data.args || {};
+            for (var name in renderArgs) {
+                args[name] = renderArgs[name];
+            }
+            placeRoi();
+            setFrameHeight();
+            if (args.autostart && !autostarted) {
+                autostarted = true;
+                startScanner();
+            }
+        }
+    });
+
+    // 把條碼填入 Streamlit 表單並提交；表單位於片段內，只會重新執行掃描片段
+    function submitBarcode(code) {
+        var input = parent.document.querySelector('.stForm .stTextInput input');
+        var submit = parent.document.querySelector('.stForm [data-testid="stFormSubmitButton"] button');
+        if (!input || !submit) {
+            return;
+        }
+        var setter = Object.getOwnPropertyDescriptor(parent.HTMLInputElement.prototype, 'value').set;
+        setter.call(input, code);
+        input.dispatchEvent(new Event('input', { bubbles: true }));
+        submit.click();
+    }
+
+    // 把累積的每幀解碼時間（以及尚未回報的條碼）送回 Python
+    function report() {
+        if (!samples.length && pendingCode === null) {
+            return;
+        }
+        seq += 1;
+        send('streamlit:setComponentValue', {
+            value: {seq: seq, code: pendingCode, decode_ms: samples},
+            dataType: 'json'
+        });
+        samples = [];
+        pendingCode = null;
+    }
+
+    // 在畫面上標出解碼區域（影片以 object-fit: cover 顯示，需按縮放比例換算）
+    function placeRoi() {
+        var width = video.videoWidth || 640;
+        var height = video.videoHeight || 480;
+        var box = video.getBoundingClientRect();
+        var scale = Math.max(box.width / width, box.height / height);
+        var roiWidth = width * args.roi[0] * scale;
+        var roiHeight = height * args.roi[1] * scale;
+        roiBox.style.width = roiWidth + 'px';
+        roiBox.style.height = roiHeight + 'px';
+        roiBox.style.left = (box.width - roiWidth) / 2 + 'px';
+        roiBox.style.top = (box.height - roiHeight) / 2 + 'px';
+    }
+
+    function found(code) {
+        var now = Date.now();
+        if (code === lastCode && now - lastCodeTime < RESUBMIT_MS) {
+            return;
+        }
+        lastCode = code;
+        lastCodeTime = now;
+        status.textContent = "已掃描到條碼：" + code;
+        if (args.submit_form) {
+            submitBarcode(code);
+        } else {
+            pendingCode = code;
+            report();
+        }
+    }
+
+    // 沒有原生 BarcodeDetector 時只能讀 EAN-13 / EAN-8，提示使用者其他格式要手動輸入
+    function showEngine(name) {
+        if (name === engine) {
+            return;
+        }
+        engine = name;
+        note.textContent = name === 'js'
+            ? "此瀏覽器不支援原生條碼辨識，只能讀取 EAN-13 / EAN-8，其他條碼請手動輸入"
+            : "";
+        setFrameHeight();
+    }
+
+    function onDecoded(event) {
+        busy = false;
+        samples.push(Math.round(event.data.ms * 10) / 10);
+        showEngine(event.data.engine);
+        var code = event.data.code;
+        if (!code) {
+            candidate = null;
+            candidateFrames = 0;
+            return;
+        }
+        candidateFrames = code === candidate ? candidateFrames + 1 : 1;
+        candidate = code;
+        if (candidateFrames === CONFIRM_FRAMES) {
+            found(code);
+        }
+    }
+
+    // 只截取解碼區域並縮小後傳給 Worker；上一幀還在解碼時跳過本幀
+    function grabFrame() {
+        if (!scannerIsRunning) {
+            return;
+        }
+        frameTimer = setTimeout(grabFrame, 1000 / args.fps);
+        if (busy || video.readyState < 2) {
+            return;
+        }
+        var width = video.videoWidth;
+        var height = video.videoHeight;
+        var roiWidth = Math.round(width * args.roi[0]);
+        var roiHeight = Math.round(height * args.roi[1]);
+        var scale = Math.min(1, MAX_WIDTH / roiWidth);
+        canvas.width = Math.round(roiWidth * scale);
+        canvas.height = Math.round(roiHeight * scale);
+        context.drawImage(video, (width - roiWidth) / 2, (height - roiHeight) / 2, roiWidth, roiHeight,
+                          0, 0, canvas.width, canvas.height);
+        var image = context.getImageData(0, 0, canvas.width, canvas.height);
+        busy = true;
+        worker.postMessage({width: image.width, height: image.height, pixels: image.data.buffer},
+                           [image.data.buffer]);
+    }
+
+    function startScanner() {
+        navigator.mediaDevices.getUserMedia({
+            video: {facingMode: "environment", width: {ideal: 1280}, height: {ideal: 720}},
+            audio: false
+        }).then(function (mediaStream) {
+            stream = mediaStream;
+            video.srcObject = stream;
+            return video.play();
+        }).then(function () {
+            if (!worker) {
+                worker = new Worker('decode_worker.js?v=' + VERSION);
+                worker.onmessage = onDecoded;
+            }
+            busy = false;
+            scannerIsRunning = true;
+            placeRoi();
+            grabFrame();
+            reportTimer = setInterval(report, args.report_seconds * 1000);
+            button.textContent = "停止掃描";
+            status.textContent = "掃描器已啟動";
+        }).catch(function (err) {
+            console.log(err);
+            status.textContent = "無法啟動掃描器：" + err;
+        });
+    }
+
+    function stopScanner() {
+        scannerIsRunning = false;
+        clearTimeout(frameTimer);
+        clearInterval(reportTimer);
+        if (stream) {
+            stream.getTracks().forEach(function (track) { track.stop(); });
+            stream = null;
+        }
+        report();
+        button.textContent = "開始掃描";
+        status.textContent = "掃描器已停止";
+    }
+
+    button.addEventListener('click', function () {
+        if (scannerIsRunning) {
+            stopScanner();
+        } else {
+            startScanner();
+        }
+    });
+    video.addEventListener('loadedmetadata', placeRoi);
+
+    // 以 Service Worker 快取解碼文件，之後離線或網路慢時也能立即載入
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('sw.js?v=' + VERSION).catch(function (err) {
+            console.log(err);
+        });
+    }
+
+    send('streamlit:componentReady', {apiVersion: 1});
+    setFrameHeight();
+})();
@@ -0,0 +1,39 @@
+// 掃描元件的 Service Worker：帶版本號的 JS 文件採用快取優先，
+// 第一次載入後不再經過網路；版本號變更時清除舊快取
+var CACHE = 'barcode-scanner-v2';
+var ASSETS = ['scanner.js?v=2', 'decode_worker.js?v=2'];
+
+self.addEventListener('install', function (event) {
+    event.waitUntil(caches.open(CACHE).then(function (cache) {
+        return cache.addAll(ASSETS);
+    }));
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function (event) {
+    event.waitUntil(caches.keys().then(function (names) {
+        return Promise.all(names.filter(function (name) {
+            return name.indexOf('barcode-scanner-') === 0 && name !== CACHE;
+        }).map(function (name) {
+            return caches.delete(name);
+        }));
+    }));
+    self.clients.claim();
+});
+
+self.addEventListener('fetch', function (event) {
+    var url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || !/\.js$/.test(url.pathname) || !url.searchParams.has('v')) {
+        return;
+    }
+    event.respondWith(caches.open(CACHE).then(function (cache) {
+        return cache.match(event.request).then(function (cached) {
+            return cached || fetch(event.request).then(function (response) {
+                if (response.ok) {
+                    cache.put(event.request, response.clone());
+                }
+                return response;
+            });
+        });
+    }));
+});
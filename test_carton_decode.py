@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from carton_decode import _views
+
+
+def dark_centroid(view):
+    ys, xs = np.nonzero(view < 128)
+    return np.array([xs.mean(), ys.mean(), 1.0]) if len(xs) else None
+
+
+@pytest.mark.parametrize('shape', [(1200, 900), (3000, 4000)])
+def test_views_map_back_to_original_coordinates(shape):
+    image = np.full(shape, 255, dtype=np.uint8)
+    # 圖片中心落在四個重疊區塊的內部
+    center = (shape[1] / 2, shape[0] / 2)
+    cv2.circle(image, (int(center[0]), int(center[1])), 12, 0, -1)
+
+    mapped = []
+    for view, matrix in _views(image):
+        point = dark_centroid(view)
+        if point is not None:
+            mapped.append(point @ cv2.invertAffineTransform(matrix).T)
+    assert len(mapped) == 3 + 4  # 三個角度與四個區塊
+    assert np.abs(np.array(mapped) - center).max() < 3
+
+
+def test_tiles_are_cut_from_full_resolution():
+    image = np.full((3000, 4000), 255, dtype=np.uint8)
+    tiles = [view for view, matrix in _views(image)][3:]
+    assert len(tiles) == 4
+    # 區塊為縮小後整張圖的兩倍，每塊的像素數有上限
+    assert max(tile.size for tile in tiles) <= 2 * 1600 * 1200 * 1.2 ** 2
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scanner_frontend', 'decode_worker.js')
+
+# 與 decode_worker.js 相同的編碼表：L 編碼的（空、條、空、條）寬度
+WIDTHS = [(3, 2, 1, 1), (2, 2, 2, 1), (2, 1, 2, 2), (1, 4, 1, 1), (1, 1, 3, 2),
+          (1, 2, 3, 1), (1, 1, 1, 4), (1, 3, 1, 2), (1, 2, 1, 3), (3, 1, 1, 2)]
+FIRST_DIGIT = ['LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG', 'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL']
+
+RUN_DECODER = """
+const fs = require('fs'), vm = require('vm');
+const ctx = {self: {}, performance, Math, Number, Float32Array, Float64Array, Uint8ClampedArray};
+vm.createContext(ctx);
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8'), ctx);
+const cases = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+console.log(JSON.stringify(cases.map(c => ctx.decodeImage(
+    new Uint8ClampedArray(fs.readFileSync(c.file)), c.width, c.height))));
+"""
+
+
+def check_digit(digits):
+    total = sum(int(d) * (1 if i % 2 else 3) for i, d in enumerate(reversed(digits)))
+    return str(-total % 10)
+
+
+def modules(code):
+    """返回條碼的模組序列（1 為黑條），兩側各留 9 個模組的空白"""
+    def digit(d, parity):
+        widths = WIDTHS[int(d)]
+        if parity == 'G':
+            widths = widths[::-1]
+        colors = (1, 0, 1, 0) if parity == 'R' else (0, 1, 0, 1)
+        return [c for c, w in zip(colors, widths) for _ in range(w)]
+
+    if len(code) == 13:
+        left, right, parities = code[1:7], code[7:], FIRST_DIGIT[int(code[0])]
+    else:
+        left, right, parities = code[:4], code[4:], 'LLLL'
+    bits = [0] * 9 + [1, 0, 1]
+    for d, parity in zip(left, parities):
+        bits += digit(d, parity)
+    bits += [0, 1, 0, 1, 0]
+    for d in right:
+        bits += digit(d, 'R')
+    return bits + [1, 0, 1] + [0] * 9
+
+
+def render(code, module_px, rng, width=480, height=120):
+    """以 module_px 像素寬的模組畫出條碼，加上模糊、雜訊與光照漸層，返回 RGBA 位元組"""
+    fine = np.repeat(1 - np.array(modules(code), dtype=np.float64), 20)
+    edges = np.round(np.arange(0, len(fine) + 1e-9, 20 / module_px)).astype(int)
+    line = np.add.reduceat(fine, edges[:-1]) / np.diff(edges)
+    line = np.convolve(np.pad(line, 1, mode='edge'), [0.25, 0.5, 0.25], mode='valid')
+    row = np.ones(width)
+    left = (width - len(line)) // 2
+    row[left:left + len(line)] = line
+    image = np.tile(row * 170 + 40, (height, 1))
+    image += rng.normal(0, 8, image.shape) + np.linspace(-20, 20, width)
+    gray = np.clip(image, 0, 255).astype(np.uint8)
+    if rng.random() < 0.3:
+        gray = gray[::-1, ::-1]  # 條碼倒置
+    return np.repeat(gray[:, :, None], 4, axis=2).tobytes()
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='需要 node')
+def test_js_decoder_reads_generated_barcodes(tmp_path):
+    rng = np.random.default_rng(0)
+    cases, expected = [], []
+    for i in range(40):
+        digits = ''.join(str(d) for d in rng.integers(0, 10, 12 if i % 4 else 7))
+        code = digits + check_digit(digits)
+        path = tmp_path / f'{i}.raw'
+        path.write_bytes(render(code, rng.uniform(2.5, 4.0), rng))
+        cases.append({'file': str(path), 'width': 480, 'height': 120})
+        expected.append(code)
+    (tmp_path / 'cases.json').write_text(json.dumps(cases))
+
+    output = subprocess.run(['node', '-e', RUN_DECODER, WORKER, str(tmp_path / 'cases.json')],
+                            capture_output=True, text=True, check=True, timeout=60).stdout
+    decoded = json.loads(output)
+    assert sum(code == want for code, want in zip(decoded, expected)) >= 34
+    # 讀不到可以，讀錯不行
+    assert all(code in (None, want) for code, want in zip(decoded, expected))
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='需要 node')
+def test_js_decoder_rejects_noise(tmp_path):
+    rng = np.random.default_rng(1)
+    cases = []
+    for i in range(20):
+        noise = rng.integers(0, 2, (120, 480)).repeat(1, axis=0) * 200 + 30
+        noise = np.repeat(noise[:1], 120, axis=0) if i % 2 else noise
+        path = tmp_path / f'{i}.raw'
+        path.write_bytes(np.repeat(noise.astype(np.uint8)[:, :, None], 4, axis=2).tobytes())
+        cases.append({'file': str(path), 'width': 480, 'height': 120})
+    (tmp_path / 'cases.json').write_text(json.dumps(cases))
+
+    output = subprocess.run(['node', '-e', RUN_DECODER, WORKER, str(tmp_path / 'cases.json')],
+                            capture_output=True, text=True, check=True, timeout=60).stdout
+    assert json.loads(output) == [None] * 20
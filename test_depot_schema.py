@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from depot_schema import normalize_workbook
+
+
+def make_raw(**columns):
+    raw = {'條碼': [4710000000001.0, 4710000000002.0, 4710000000003.0], '藥品名稱': ['甲', '乙', '丙']}
+    raw.update(columns)
+    return pd.DataFrame(raw)
+
+
+def test_float_code_columns_keep_integer_form():
+    # 有空格的數字列會被 Excel 讀成浮點數
+    df, _ = normalize_workbook(make_raw(藥品代碼=[12345.0, np.nan, 678.0], 藥庫層數=[1.0, 2.0, np.nan]))
+    assert df['藥品代碼'].tolist()[::2] == ['12345', '678']
+    assert df['藥庫層數'].tolist()[:2] == ['1', '2']
+    assert df['條碼'].tolist()[0] == '4710000000001'
+
+
+def test_mixed_text_column_drops_float_suffix():
+    df, _ = normalize_workbook(make_raw(藥品代碼=['A01', 12345.0, '7.5']))
+    assert df['藥品代碼'].tolist() == ['A01', '12345', '7.5']
+
+
+def test_same_code_with_and_without_blanks():
+    with_blank, _ = normalize_workbook(make_raw(藥品代碼=[12345.0, np.nan, 1.0]))
+    without_blank, _ = normalize_workbook(make_raw(藥品代碼=[12345, 2, 1]))
+    assert with_blank['藥品代碼'][0] == without_blank['藥品代碼'][0] == '12345'
+
+
+def test_duplicate_header_is_reported():
+    df, report = normalize_workbook(make_raw(EAN=['1', '2', '3']))
+    assert df['條碼'].tolist()[0] == '4710000000001'
+    row = report[report['欄位'] == '條碼']
+    assert row['問題'].tolist() == ["重複欄位，已略過 'EAN'"]
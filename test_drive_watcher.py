@@ -0,0 +1,75 @@
+import os
+import threading
+
+import pandas as pd
+
+from drive_watcher import DriveChangeWatcher, LocalDriveService, WorkbookCache, download_file_bytes
+
+FOLDER_ID = 'folder'
+
+
+def write_workbook(root, name, rows):
+    path = os.path.join(root, FOLDER_ID, name)
+    pd.DataFrame({'條碼': ['4710000000001'] * rows, '藥品名稱': ['甲'] * rows}).to_excel(path, index=False)
+    return f"{FOLDER_ID}/{name}"
+
+
+def make_watcher(tmp_path):
+    os.makedirs(tmp_path / FOLDER_ID)
+    service = LocalDriveService(str(tmp_path))
+    watcher = DriveChangeWatcher(service, FOLDER_ID, WorkbookCache(),
+                                 token_path=str(tmp_path / 'token.json'))
+    return service, watcher
+
+
+def test_poll_prefetches_new_workbook(tmp_path):
+    service, watcher = make_watcher(tmp_path)
+    assert watcher.poll() == []  # 第一次只保存 startPageToken
+
+    file_id = write_workbook(str(tmp_path), '20240801.xlsx', 2)
+    assert watcher.poll() == [file_id]
+    assert len(watcher.cache.get(file_id)) == 2
+    assert [file['id'] for file in watcher.cache.listing(FOLDER_ID)] == [file_id]
+    assert download_file_bytes(service, file_id)[:2] == b'PK'
+
+
+def test_removed_workbook_is_dropped(tmp_path):
+    _, watcher = make_watcher(tmp_path)
+    file_id = write_workbook(str(tmp_path), '20240801.xlsx', 1)
+    watcher.poll()
+    assert watcher.cache.get(file_id) is not None
+
+    os.remove(os.path.join(str(tmp_path), file_id))
+    watcher.poll()
+    assert watcher.cache.get(file_id) is None
+    assert watcher.cache.listing(FOLDER_ID) == []
+
+
+def test_local_service_is_safe_across_threads(tmp_path):
+    service, _ = make_watcher(tmp_path)
+    write_workbook(str(tmp_path), '20240801.xlsx', 1)
+    errors = []
+
+    def list_files():
+        try:
+            for _ in range(20):
+                service.files().list(q=f"'{FOLDER_ID}' in parents").execute()
+                service.changes().list(pageToken='0').execute()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=list_files) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_cache_keeps_only_newest_workbooks():
+    cache = WorkbookCache(limit=2)
+    df = pd.DataFrame({'條碼': ['4710000000001']})
+    for day in ('01', '03', '02'):
+        cache.put({'id': day, 'modifiedTime': f'2024-08-{day}T00:00:00.000Z'}, df)
+    assert cache.get('01') is None
+    assert cache.get('02') is not None and cache.get('03') is not None
@@ -0,0 +1,97 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+
+from forecast import demand_matrix, fit_forecast, forecast_site, forecast_sites, load_history, propose_transfers
+
+
+def make_history(stocks, transfers):
+    files = [{'id': str(day), 'name': f'202408{day + 1:02d}.xlsx'} for day in range(len(stocks))]
+    workbooks = {file['id']: make_workbook(stock, transfer)
+                 for file, stock, transfer in zip(files, stocks, transfers)}
+    return load_history(files, lambda file_id, modified_time: workbooks[file_id])
+
+
+def make_workbook(stock, transfer):
+    return pd.DataFrame({
+        '條碼': ['4710000000001'],
+        '藥品代碼': ['D1'],
+        '藥品名稱': ['甲'],
+        '現有庫存': [stock],
+        '盤撥量': [transfer],
+        '最小包裝': [1],
+    })
+
+
+def test_duplicate_dates_keep_latest_upload():
+    files = [
+        {'id': 'a', 'name': '20240801.xlsx', 'modifiedTime': '2024-08-01T08:00:00Z'},
+        {'id': 'b', 'name': '20240802.xlsx', 'modifiedTime': '2024-08-02T08:00:00Z'},
+        {'id': 'c', 'name': '20240802 (1).xlsx', 'modifiedTime': '2024-08-02T09:00:00Z'},
+    ]
+    workbooks = {'a': make_workbook(10, 5), 'b': make_workbook(99, 99), 'c': make_workbook(8, 4)}
+    history = load_history(files, lambda file_id, modified_time: workbooks[file_id])
+    assert len(history) == 2
+    assert history['現有庫存'].tolist() == [10, 8]
+
+    proposal = forecast_site(history)
+    assert proposal['藥品代碼'].tolist() == ['D1']
+
+
+def test_files_without_name_dates_share_modified_day():
+    files = [
+        {'id': 'a', 'name': '撥補.xlsx', 'modifiedTime': '2024-08-02T08:00:00Z'},
+        {'id': 'b', 'name': '撥補 (1).xlsx', 'modifiedTime': '2024-08-02T10:00:00Z'},
+    ]
+    workbooks = {'a': make_workbook(10, 5), 'b': make_workbook(8, 4)}
+    history = load_history(files, lambda file_id, modified_time: workbooks[file_id])
+    assert history['現有庫存'].tolist() == [8]
+
+
+def test_blank_stock_falls_back_to_transfer():
+    history = make_history([10, 12, None, 11], [5, 5, 5, 5])
+    assert history['現有庫存'].isna().tolist() == [False, False, True, False]
+    demand = demand_matrix(history).loc['D1'].tolist()
+    # 第 2 天：10 + 5 - 12 = 3；第 3、4 天缺少庫存，以盤撥量代替
+    assert demand[1:] == [3, 5, 5]
+
+
+def test_forecast_follows_day_of_week():
+    dates = pd.date_range('2024-07-01', periods=28, freq='D')  # 2024-07-01 是星期一
+    values = np.where(dates.dayofweek == 0, 30.0, 10.0)
+    monday = fit_forecast(pd.DataFrame([values], index=['D1'], columns=dates))
+    tuesday = fit_forecast(pd.DataFrame([values[:-6]], index=['D1'], columns=dates[:-6]))
+    assert monday['D1'] > 20 > 15 > tuesday['D1']
+
+
+def test_proposal_rounds_to_packs_and_respects_caps():
+    latest = pd.DataFrame({
+        '藥品代碼': ['D1', 'D2', 'D3', 'D4'],
+        '現有庫存': [0, None, 0, 0],
+        '安全存量': [0, 0, 0, 0],
+        '最高庫存': [np.nan, np.nan, 0, 3],
+        '藥庫庫存': [np.nan, 0, np.nan, np.nan],
+        '最小包裝': [5, 5, 5, 1],
+    })
+    forecast = pd.Series(7.0, index=latest['藥品代碼'])
+    proposal = propose_transfers(latest, forecast)
+    # 沒有上限時進位到整包；藥庫庫存或最高庫存為 0 時不撥補
+    assert proposal['撥補盒箱數'].tolist() == [2, 0, 0, 3]
+    assert proposal['盤撥量'].tolist() == [10, 0, 0, 3]
+
+
+def test_forecast_sites_does_not_rerun_app_script(tmp_path, monkeypatch):
+    marker = tmp_path / 'imported'
+    script = tmp_path / 'app.py'
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    app = types.ModuleType('__main__')
+    app.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, '__main__', app)
+
+    histories = {'A': make_history([10, 8], [5, 5]), 'B': make_history([20, 15], [5, 5])}
+    results = forecast_sites(histories, processes=2)
+    assert set(results) == {'A', 'B'}
+    assert results['A']['藥品代碼'].tolist() == ['D1']
+    assert not marker.exists()
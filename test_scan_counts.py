@@ -0,0 +1,110 @@
+import pandas as pd
+
+from scan_counts import MAX_COUNTERS, PICK, RECEIVE, _counters, get_shared_counter, reconcile
+
+
+def make_df():
+    return pd.DataFrame({
+        '條碼': ['4710000000001', '4710000000002'],
+        '藥品代碼': ['D1', 'D2'],
+        '藥品名稱': ['甲', '乙'],
+        '盤撥量': [2, 1],
+        '最小包裝': [1, 1],
+    })
+
+
+def test_counts_are_shared_between_sessions():
+    picker_df, receiver_df = make_df(), make_df()
+    key = ('shared', 'v1')
+    get_shared_counter(key, picker_df).scan_barcode('4710000000001', PICK, packs=2)
+    get_shared_counter(key, picker_df).scan_barcode('4710000000002', PICK)
+
+    receiver = get_shared_counter(key, receiver_df)
+    receiver.scan_barcode('4710000000001', RECEIVE, packs=2)
+    receiver.scan_barcode('4710000000002', RECEIVE)
+    assert reconcile(receiver_df, receiver).empty
+
+
+def test_reconcile_reports_short_receipt():
+    df = make_df()
+    counter = get_shared_counter(('short', 'v1'), df)
+    counter.scan_barcode('4710000000001', PICK, packs=2)
+    counter.scan_barcode('4710000000001', RECEIVE)
+    report = reconcile(df, counter)
+    assert report['藥品代碼'].tolist() == ['D1']
+    assert report['結果'].tolist() == ['短收']
+
+
+def test_new_workbook_version_gets_new_counter():
+    df = make_df()
+    first = get_shared_counter(('file', 'v1'), df)
+    first.scan_barcode('4710000000001', PICK)
+    assert get_shared_counter(('file', 'v2'), df) is not first
+    assert get_shared_counter(('file', 'v1'), df) is first
+
+
+def test_blank_transfer_quantity_is_not_done_on_load():
+    df = make_df()
+    df['盤撥量'] = [2, None]
+    df['撥補盒箱數'] = [None, None]
+    counter = get_shared_counter(('blank', 'v1'), df)
+    assert counter.progress(PICK) == (0, 2)
+    counter.scan_barcode('4710000000002', PICK)
+    assert counter.status(1, PICK) == '已檢貨'
+
+
+def test_zero_transfer_quantity_is_left_out():
+    df = make_df()
+    df['盤撥量'] = [2, 0]
+    counter = get_shared_counter(('zero', 'v1'), df)
+    assert counter.target.tolist() == [2, 0]
+    assert counter.progress(PICK) == (0, 1)
+    counter.scan_barcode('4710000000001', PICK, packs=2)
+    counter.scan_barcode('4710000000001', RECEIVE, packs=2)
+    assert counter.progress(PICK) == (1, 1)
+    assert reconcile(df, counter).empty
+
+
+def test_counters_are_evicted_least_recently_used():
+    df = make_df()
+    first = get_shared_counter(('lru', 0), df)
+    for version in range(1, MAX_COUNTERS):
+        get_shared_counter(('lru', version), df)
+    assert get_shared_counter(('lru', 0), df) is first  # 重新使用後移到最新
+    get_shared_counter(('lru', MAX_COUNTERS), df)
+    assert get_shared_counter(('lru', 0), df) is first
+    assert ('lru', 1) not in _counters
+
+
+def test_fractional_pack_size_still_completes():
+    df = make_df()
+    df['最小包裝'] = [0.5, 2.5]
+    df['盤撥量'] = [1, 3]
+    counter = get_shared_counter(('fraction', 'v1'), df)
+    assert counter.step.tolist() == [1, 3]
+    counter.scan_barcode('4710000000001', PICK)
+    counter.scan_barcode('4710000000002', PICK)
+    assert counter.progress(PICK) == (2, 2)
+
+
+def test_reconcile_falls_back_to_barcode_without_codes():
+    df = make_df()
+    df['藥品代碼'] = ''  # 工作簿沒有藥品代碼時 normalize_workbook 補上的預設值
+    counter = get_shared_counter(('no-code', 'v1'), df)
+    counter.scan_barcode('4710000000001', PICK)
+    counter.scan_barcode('4710000000002', PICK)
+    report = reconcile(df, counter)
+    assert report['條碼'].tolist() == ['4710000000001', '4710000000002']
+
+
+def test_scan_many_counts_repeats_and_missing_codes():
+    df = make_df()
+    df = pd.concat([df, df.iloc[[0]]], ignore_index=True)  # 同一條碼有兩行
+    counter = get_shared_counter(('many', 'v1'), df)
+    counter.scan_barcode('4710000000001', RECEIVE, packs=2)  # 第一行已收齊
+    added, missing = counter.scan_many(
+        ['4710000000001', '4710000000002', '4710000000001', '999'], RECEIVE)
+    # 重複出現的條碼一次加上多個包裝，並計入尚未收齊的行
+    assert added == {2: 2, 1: 1}
+    assert missing == ['999']
+    assert counter.counts[RECEIVE].tolist() == [2, 1, 2]
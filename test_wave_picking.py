@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from wave_picking import WaveBoard, plan_waves
+
+
+def make_df(zones, rows_per_zone=10):
+    return pd.DataFrame({
+        '藥庫位置': np.repeat(zones, rows_per_zone),
+        '藥庫層數': '1',
+        '盤撥量': 1,
+        '最小包裝': 1,
+        '撥補盒箱數': 0,
+    })
+
+
+def test_plan_balances_lines():
+    df = make_df(['A', 'B', 'C', 'D'])
+    board = WaveBoard(df)
+    assignment = board.plan(2)
+    assert (assignment >= 0).all()
+    assert np.bincount(assignment).tolist() == [20, 20]
+
+
+def test_large_zone_is_split():
+    seconds = np.full(40, 20.0)
+    zones = np.zeros(40, dtype=np.int64)
+    assignment = plan_waves(seconds, zones, np.ones(40, dtype=bool), 2)
+    lines = np.bincount(assignment)
+    # 每段都要另加一次走動時間，兩份可能相差一兩行
+    assert len(lines) == 2 and abs(lines[0] - lines[1]) <= 2
+
+
+def test_rebalance_after_early_finish():
+    board = WaveBoard(make_df(['A', 'B']))
+    assignment = board.plan(2)
+    first, second = assignment[0], assignment[10]
+    assert first != second
+    board.mark_done(0)
+    for position in np.flatnonzero(assignment == second):
+        board.mark_done(position)
+
+    assert board.rebalance()
+    remaining = board.workload()['剩餘行數'].tolist()
+    assert min(remaining) > 0 and sum(remaining) == 9
+    # 目前位置旁的行留給原檢貨員
+    assert board.assignment[1] == first
+
+
+def test_rebalance_only_reports_changes():
+    board = WaveBoard(make_df(['A', 'B']))
+    assignment = board.plan(2)
+    for position in np.flatnonzero(assignment == assignment[10]):
+        board.mark_done(position)
+    assert board.rebalance()
+    assert not board.rebalance()
+
+
+def test_no_rebalance_with_fewer_units_than_pickers():
+    board = WaveBoard(make_df(['A', 'B'], rows_per_zone=2))
+    assignment = board.plan(2)
+    board.mark_done(0)
+    for position in np.flatnonzero(assignment == assignment[2]):
+        board.mark_done(position)
+    before = board.assignment.copy()
+    # 只剩一行且已保留給原檢貨員，不需搬動
+    assert not board.rebalance()
+    assert np.array_equal(board.assignment, before)
@@ -0,0 +1,171 @@
+import heapq
+import threading
+
+import numpy as np
+import pandas as pd
+
+LINE_SECONDS = 20   # 每一行的基本檢貨時間（找位置、掃描）
+PACK_SECONDS = 4    # 每多拿一個包裝的時間
+ZONE_SECONDS = 30   # 進入一個區域的走動時間
+PIN_ROWS = 3        # 重新分配時保留給檢貨員、位於其目前位置附近的行數
+
+
+def pick_seconds(df):
+    """按盤撥量估算每一行的檢貨時間（秒）"""
+    pack = pd.to_numeric(df['最小包裝'], errors='coerce').astype(np.float64).fillna(1).to_numpy()
+    pack = np.where(pack > 0, pack, 1)
+    quantity = pd.to_numeric(df['盤撥量'], errors='coerce').astype(np.float64).fillna(0).to_numpy()
+    boxes = pd.to_numeric(df['撥補盒箱數'], errors='coerce').astype(np.float64).fillna(0).to_numpy()
+    packs = np.where(boxes > 0, boxes, np.ceil(quantity / pack))
+    return LINE_SECONDS + PACK_SECONDS * np.maximum(packs - 1, 0)
+
+
+def zone_codes(df):
+    """以 藥庫位置 / 藥庫層數 劃分區域，返回每行的區域編號"""
+    zones = df['藥庫位置'].astype(str).str.strip() + '/' + df['藥庫層數'].astype(str).str.strip()
+    codes, _ = pd.factorize(zones, sort=True)
+    return codes
+
+
+def _work_units(seconds, zones, rows, target):
+    """把 rows 按區域分成工作單位 [(估計秒數, 行)]，超過 target 的區域依位置順序切段"""
+    units = []
+    for zone in np.unique(zones[rows]):
+        chunk, cost = [], ZONE_SECONDS
+        for row in rows[zones[rows] == zone]:
+            if chunk and cost + seconds[row] > target:
+                units.append((cost, np.array(chunk)))
+                chunk, cost = [], ZONE_SECONDS
+            chunk.append(row)
+            cost += seconds[row]
+        units.append((cost, np.array(chunk)))
+    return units
+
+
+def _split(seconds, zones, pending, pickers, fixed):
+    # 返回（預先指定的行, 各檢貨員已有的估計秒數, 其餘的工作單位）
+    keep = np.zeros(len(seconds), dtype=bool)
+    loads = np.zeros(pickers)
+    if fixed is not None:
+        keep = pending & (fixed >= 0) & (fixed < pickers)
+        for picker in np.unique(fixed[keep]):
+            rows = keep & (fixed == picker)
+            loads[picker] = seconds[rows].sum() + ZONE_SECONDS * len(np.unique(zones[rows]))
+    rows = np.flatnonzero(pending & ~keep)
+    target = (seconds[rows].sum() + ZONE_SECONDS * len(np.unique(zones[rows])) + loads.sum()) / pickers
+    return keep, loads, _work_units(seconds, zones, rows, target)
+
+
+def plan_waves(seconds, zones, pending, pickers, fixed=None):
+    """把尚未完成的行按區域分成 pickers 份，使各份的估計時間接近
+
+    seconds、zones、pending 為每行的估計時間、區域編號與是否待檢；
+    fixed 為每行預先指定的檢貨員（-1 表示不指定），重新分配時用來保留
+    檢貨員手邊的幾行。其餘的行使用最長處理時間優先（LPT）的貪婪分配，
+    超過平均負載的區域按行拆開。返回每行的檢貨員編號，不需檢貨的行為 -1。
+    """
+    assignment = np.full(len(seconds), -1, dtype=np.int16)
+    if pickers <= 0 or not pending.any():
+        return assignment
+
+    keep, loads, units = _split(seconds, zones, pending, pickers, fixed)
+    if keep.any():
+        assignment[keep] = fixed[keep]
+    heap = [(loads[picker], picker) for picker in range(pickers)]
+    heapq.heapify(heap)
+    for cost, unit_rows in sorted(units, key=lambda unit: unit[0], reverse=True):
+        load, picker = heapq.heappop(heap)
+        assignment[unit_rows] = picker
+        heapq.heappush(heap, (load + cost, picker))
+    return assignment
+
+
+class WaveBoard:
+    """同一份工作簿在所有裝置之間共享的分波狀態"""
+
+    def __init__(self, df):
+        self._lock = threading.Lock()
+        self.seconds = pick_seconds(df)
+        self.zones = zone_codes(df)
+        self.done = np.zeros(len(df), dtype=bool)
+        self.assignment = np.full(len(df), -1, dtype=np.int16)
+        self.pickers = 0
+        self.last_done = {}  # 檢貨員 → 最近完成的行，代表其目前位置
+
+    def plan(self, pickers, done=None):
+        with self._lock:
+            if done is not None:
+                self.done |= done
+            self.pickers = pickers
+            self.last_done = {}
+            self.assignment = plan_waves(self.seconds, self.zones, ~self.done, pickers)
+            return self.assignment.copy()
+
+    def mark_done(self, position):
+        with self._lock:
+            self.done[position] = True
+            owner = int(self.assignment[position])
+            if owner >= 0:
+                self.last_done[owner] = position
+
+    def rows_for(self, picker):
+        with self._lock:
+            return np.flatnonzero(self.assignment == picker)
+
+    def workload(self):
+        """各檢貨員剩餘的行數與估計秒數"""
+        with self._lock:
+            remaining = (self.assignment >= 0) & ~self.done
+            owners = self.assignment[remaining]
+            lines = np.bincount(owners, minlength=self.pickers)
+            seconds = np.bincount(owners, weights=self.seconds[remaining], minlength=self.pickers)
+        return pd.DataFrame({'檢貨員': np.arange(1, self.pickers + 1), '剩餘行數': lines,
+                             '估計剩餘時間(分)': np.round(seconds / 60, 1)})
+
+    def _fixed_rows(self, remaining):
+        # 每位檢貨員保留目前位置附近（同一區域內最近的 PIN_ROWS 行），其餘的行重新分配
+        fixed = np.full(len(self.done), -1, dtype=np.int16)
+        for owner, position in self.last_done.items():
+            mine = np.flatnonzero(remaining & (self.assignment == owner) & (self.zones == self.zones[position]))
+            nearest = mine[np.argsort(np.abs(mine - position), kind='stable')[:PIN_ROWS]]
+            fixed[nearest] = owner
+        return fixed
+
+    def rebalance(self):
+        """有檢貨員提早完成時重新分配剩餘的行；只有分配確實改變時返回 True"""
+        with self._lock:
+            if self.pickers <= 1:
+                return False
+            remaining = (self.assignment >= 0) & ~self.done
+            lines = np.bincount(self.assignment[remaining], minlength=self.pickers)
+            if lines.min() > 0 or lines.sum() == 0:
+                return False
+            fixed = self._fixed_rows(remaining)
+            _, loads, units = _split(self.seconds, self.zones, remaining, self.pickers, fixed)
+            # 工作單位少於人數時無論怎樣分都有人閒置，不做無謂的搬動
+            if len(units) + np.count_nonzero(loads) < self.pickers:
+                return False
+            assignment = plan_waves(self.seconds, self.zones, remaining, self.pickers, fixed)
+            assignment[self.done] = self.assignment[self.done]
+            if np.array_equal(assignment, self.assignment):
+                return False
+            self.assignment = assignment
+            return True
+
+
+MAX_BOARDS = 8  # 最多保留的工作簿版本數，超過時丟棄最久未使用的
+
+_boards = {}
+_boards_lock = threading.Lock()
+
+
+def get_wave_board(key, df):
+    """按工作簿取得共享的 WaveBoard；行數不同（工作簿已更新）時重新建立"""
+    with _boards_lock:
+        board = _boards.pop(key, None)
+        if board is None or len(board.done) != len(df):
+            board = WaveBoard(df)
+        _boards[key] = board
+        while len(_boards) > MAX_BOARDS:
+            del _boards[next(iter(_boards))]
+        return board